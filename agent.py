@@ -5,6 +5,7 @@ import logging
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), 'agent')))
 from graph import Graph
 from client import AgentClient
+from llm import LLM
 
 logging.basicConfig(level=logging.INFO)
 
@@ -15,6 +16,12 @@ agent_client = AgentClient(
         )
 graph = Graph(agent_client=agent_client)
 
+# Creates the LLM client and waits for the servers to warm up before taking the first message
+LLM(temperature=0.0)
+for server, ready in agent_client.wait_until_ready().items():
+    if not ready:
+        logging.warning(f"{server} isn't ready, the first requests may be slow or fail")
+
 while True:
     try:
         # Prompt the user for input
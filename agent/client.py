@@ -3,6 +3,8 @@ import asyncio
 import json
 import base64
 import logging
+import time
+import urllib.request
 
 logger = logging.getLogger(__name__)
 
@@ -12,6 +14,28 @@ class AgentClient:
         self.food_server_path = food_server_path
         self.image_server_path = image_server_path
 
+    def wait_until_ready(self, timeout: float = 120.0, interval: float = 1.0) -> dict[str, bool]:
+        """Polls /ready on each HTTP server until they're all warmed up or the timeout expires."""
+        paths = [self.language_server_path, self.food_server_path, self.image_server_path]
+        urls = {path: path.rsplit("/mcp", 1)[0] + "/ready" for path in paths if path.startswith("http")}
+        ready = {path: False for path in urls}
+        deadline = time.monotonic() + timeout
+
+        while not all(ready.values()) and time.monotonic() < deadline:
+            for path, url in urls.items():
+                if ready[path]:
+                    continue
+                try:
+                    with urllib.request.urlopen(url, timeout=interval) as response:
+                        ready[path] = response.status == 200
+                except Exception as e:
+                    logger.info(f"{url} isn't ready yet: {e}")
+
+            if not all(ready.values()):
+                time.sleep(interval)
+
+        return ready
+
     def run_identify_language(self, message: str) -> str:
         async def identify_language(message: str) -> str:
             language = None
@@ -4,15 +4,15 @@ from langgraph.types import Literal
 from langgraph.graph import START
 from langgraph.graph import END
 from client import AgentClient
-from state import State
+from recipe_cache import RecipeCache, recipe_cache
+from state import State, serialized_size
+import difflib
 import json
+import re
 import sys
 import os
 import logging
 
-from IPython.display import Image, display
-from langchain_core.runnables.graph import CurveStyle, MermaidDrawMethod, NodeStyles
-
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from llm import LLM
 
@@ -20,14 +20,38 @@ logging.basicConfig(level=os.environ.get("LOGLEVEL", "INFO"))
 logger = logging.getLogger(__name__)
 
 class Graph:
-    def __init__(self, agent_client: AgentClient = None):
+    def __init__(self, agent_client: AgentClient = None, cache: RecipeCache = None):
        self.client = agent_client if agent_client else AgentClient()
+       # An empty cache is falsy, so it's compared to None
+       self.cache = cache if cache is not None else recipe_cache
        self.graph = self.setup_graph()
        self.state = {}
 
     def message(self, message: str) -> str:
-        self.state = self.graph.invoke(self.state | { "message": message })
-        return self.state['response']
+        state = self.graph.invoke(self.state | { "message": message })
+        # The response is only needed by the caller, so it isn't kept in the session state
+        response = state.pop('response')
+        self.state = state
+
+        logger.info(f"Session state: {serialized_size(self.state)} bytes serialized, {len(self.cache)} recipes in the cache")
+        return response
+
+    def draw(self, path: str = "agent_graph.png") -> None:
+        # Only needed to document the graph, so the drawing code isn't imported at runtime
+        from langchain_core.runnables.graph import CurveStyle, MermaidDrawMethod, NodeStyles
+
+        png = self.graph.get_graph().draw_mermaid_png(
+                curve_style=CurveStyle.LINEAR,
+                node_colors=NodeStyles(),
+                draw_method=MermaidDrawMethod.API
+                )
+
+        with open(path, "wb") as f:
+            f.write(png)
+
+    def recipe_options(self, state: State) -> list[dict]:
+        """Resolves the handles in the state to the recipes kept in the cache."""
+        return [self.cache.get(handle) for handle in state.get("recipeOptions", [])]
 
     def setup_graph(self):
         builder = StateGraph(State)
@@ -69,28 +93,28 @@ class Graph:
         
     def identify_language(self, state: State):
         message = state["message"]
-        return state | { "language": self.client.run_identify_language(message) }
+        return { "language": self.client.run_identify_language(message) }
 
     def translate_to_english(self, state: State):
         message = state["message"]
         from_language = state["language"]
         to_language = "English"
     
-        return state | { "enMessage": self.client.run_translate(message, from_language, to_language) }
+        return { "enMessage": self.client.run_translate(message, from_language, to_language) }
     
     def extract_preferences(self, state: State):
         request = state["enMessage"]
     
-        return state | { "preferences": self.client.run_define_preferences(request) }
+        return { "preferences": self.client.run_define_preferences(request) }
     
     def recommend_recipes(self, state: State):
         preferences = state["preferences"]
         results = self.client.run_find_matches(preferences)
     
-        return state | { "enRecipeOptions": results }
+        return { "recipeOptions": [self.cache.put(recipe) for recipe in results] }
     
     def translate_recipe_options(self, state: State):
-        recipe_options = state["enRecipeOptions"]
+        recipe_options = self.recipe_options(state)
         to_language = state["language"]
 
         formatted_options = "".join([f"- {option['recipeTitle']}: {option['shortDescription']} Takes {option['timeToPrepare']} and has {option['calories']}\n" for option in recipe_options])
@@ -100,16 +124,24 @@ Here are some recipe options:
 {formatted_options}
 Choose one of them, or let me know if you want to update your preferences.
         """
+        if not recipe_options:
+            # find_matches returns nothing when no recipe respects the constraints
+            text = "I couldn't find recipes that match your preferences. Could you tell me what to change, e.g. fewer restrictions?"
         translation = self.client.run_translate(text, "English", to_language)
     
-        return state | { "translatedRecipeOptions": translation, "response": translation }
+        return { "response": translation }
     
     def update_or_select_recipe(self, state: State) -> Command[Literal["select_recipe", "update_preferences", "unable_to_help"]]:
+        options = dict(zip(state['recipeOptions'], self.recipe_options(state)))
+        titles = {recipe['recipeTitle']: handle for handle, recipe in options.items()}
+        formatted_options = "".join([f"- {recipe['recipeTitle']}: {recipe['shortDescription']}\n" for recipe in options.values()])
         prompt=f"""
-        Given the following prompt in {state['language']}: {state['message']} and the recipe options {state['enRecipeOptions']} in English, 
-        return a JSON with the user's choice. 
+        Given the following prompt in {state['language']}: {state['message']} and the recipe options below in English, 
+        return a JSON with the user's choice. The options are given as "- Title: description", and the user may refer to
+        an option by its title or by something in its description.
+        {formatted_options}
         If the user has mentioned one of the recipe options and wants to select it, return:
-        {{ "action": "select_recipe", "recipeSelected": "Name of the recipe that matches the recipe options" }}.
+        {{ "action": "select_recipe", "recipeSelected": "Exact title of the chosen recipe option" }}.
         If the user wants a different recipe, or if it isn't clear that they chose a recipe, return:
         {{ "action": "update_preferences" }}.
         If the options above don't apply, return:
@@ -167,16 +199,51 @@ Choose one of them, or let me know if you want to update your preferences.
         option = json.loads(result.text.replace("```json", "").replace("```", ""))
     
         logger.info(f"Decided action: {option}")
-    
-        return  Command(
-                update=state | { "recipeSelected": option["recipeSelected"] } if option["action"] == "select_recipe" else state,
-                goto=option["action"]
-                )
+
+        if option["action"] == "select_recipe":
+            title = self.match_title(option.get("recipeSelected", ""), list(titles))
+            if title is None:
+                logger.info(f"Couldn't match {option.get('recipeSelected')} to the options, updating the preferences instead")
+                return Command(goto="update_preferences")
+
+            return Command(update={ "recipeSelected": titles[title] }, goto="select_recipe")
+
+        return Command(goto=option["action"])
+
+    @staticmethod
+    def match_title(choice: str, titles: list[str]) -> str | None:
+        """Finds the option the LLM chose, which may differ from the title in case, punctuation or wording."""
+        def normalize(title):
+            return " ".join(re.findall(r"[^\W_]+", title.lower()))
+
+        normalized = {normalize(title): title for title in titles}
+        choice = normalize(choice)
+        if not choice:
+            return None
+        if choice in normalized:
+            return normalized[choice]
+
+        # Whole words only and not too short, so "a" doesn't pick "Banana Bread". A choice shared by
+        # several options, like "curry" for "Chicken Curry" and "Tofu Curry", is ambiguous.
+        containing = [title for key, title in normalized.items()
+                      if min(len(choice), len(key)) >= 3 and (f" {choice} " in f" {key} " or f" {key} " in f" {choice} ")]
+        if containing:
+            return containing[0] if len(containing) == 1 else None
+
+        close = difflib.get_close_matches(choice, list(normalized), n=1, cutoff=0.6)
+        return normalized[close[0]] if close else None
     
     def select_recipe(self, state: State) -> State:
-        logger.info(f"User selected recipe: {state.get('recipeSelected', 'N/A')}")
-        recipe_text = state['recipeSelected']
-        recipe = [recipe for recipe in state['enRecipeOptions'] if recipe['recipeTitle'] == recipe_text][0]
+        recipe = self.cache.get(state['recipeSelected'])
+        logger.info(f"User selected recipe: {recipe['recipeTitle']}")
+
+        # The description is rebuilt from the cache when needed instead of being kept in the state
+        return {}
+
+    def selected_recipe_description(self, state: State) -> str:
+        return self.describe_recipe(self.cache.get(state['recipeSelected']))
+
+    def describe_recipe(self, recipe: dict) -> str:
         ingredients = "".join([f"- {ingredient}\n" for ingredient in recipe['ingredients']])
         instructions = "".join([f"{i+1}. {step}\n" for i, step in enumerate(recipe['instructions'])])
 
@@ -198,18 +265,17 @@ Instructions:
 
         logger.info(f"Recipe details: {recipe_text}")
     
-        return { 'selectedRecipeDescription': recipe_text } | state
+        return recipe_text
     
     def generate_image(self, state: State) -> State:
-        recipe = state['selectedRecipeDescription']
+        recipe = self.selected_recipe_description(state)
     
         self.client.run_create_image(recipe, state['language'])
     
-        return { 'imageGenerated': True } | state
+        return { 'imageGenerated': True }
     
     def responds_with_recipe(self, state: State) -> State:
-        logger.info(f"Providing recipe details to user: {state.get('selectedRecipeDescription', 'N/A')}")
-        selected_recipe = state['selectedRecipeDescription']
+        selected_recipe = self.selected_recipe_description(state)
         result = f"""
 Here are the details for your recipe:
 {selected_recipe}
@@ -221,7 +287,7 @@ The recipe's image was saved to results.png
                                              state['language'], 
                                              formatting="and turn it into a markdown and transform arrays into bullet points")
 
-        return state | { 'response': response }
+        return { 'response': response }
     
     def unable_to_help(self, state: State) -> State:
         logger.info("Unable to help with the current request.")
@@ -231,25 +297,25 @@ The recipe's image was saved to results.png
                                             "English", 
                                             from_language)
     
-        return state | { 'response': message }
+        return { 'response': message }
     
     def update_preferences(self, state: State) -> State:
         logger.info("Updating user preferences based on new request.")
         current_preferences = state['preferences']
         updated_request = state['message']
-        suggestions = state['enRecipeOptions']
+        suggestions = self.recipe_options(state)
     
         en_message = self.client.run_translate(updated_request, state['language'], 'English')
         logger.info(f"Translated updated request to English: {en_message}")
         preferences = self.client.run_update_preferences(current_preferences, en_message, suggestions)
     
-        return state | { 'preferences': preferences, "enMessage": en_message }
+        return { 'preferences': preferences, "enMessage": en_message }
     
     def decide_action(self, state: State) -> str:
         if "language" not in state or state["language"] == "N/A":
             logger.info("Deciding to identify language")
             return "identify_language"
-        elif "enRecipeOptions" in state:
+        elif state.get("recipeOptions") and all(handle in self.cache for handle in state["recipeOptions"]):
             logger.info("Deciding to update or select recipe")
             return "update_or_select_recipe"
         else:
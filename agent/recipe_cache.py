@@ -0,0 +1,51 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import threading
+
+class RecipeCache:
+    """Bounded LRU cache holding the recipe options returned by the food server.
+
+    The graph state only keeps the short handles returned by put(), so the full recipes
+    aren't copied on every node or stored in every checkpoint.
+    """
+
+    def __init__(self, max_size: int = 512):
+        self.max_size = max_size
+        self._recipes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, recipe: dict) -> str:
+        handle = self.handle(recipe)
+
+        with self._lock:
+            self._recipes[handle] = recipe
+            self._recipes.move_to_end(handle)
+            while len(self._recipes) > self.max_size:
+                self._recipes.popitem(last=False)
+
+        return handle
+
+    def get(self, handle: str) -> dict | None:
+        with self._lock:
+            recipe = self._recipes.get(handle)
+            if recipe is not None:
+                self._recipes.move_to_end(handle)
+            return recipe
+
+    def __contains__(self, handle: str) -> bool:
+        with self._lock:
+            return handle in self._recipes
+
+    def __len__(self) -> int:
+        return len(self._recipes)
+
+    @staticmethod
+    def handle(recipe: dict) -> str:
+        # The same recipe always gets the same handle, so repeated suggestions share an entry
+        content = json.dumps(recipe, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        return "r" + hashlib.sha1(content).hexdigest()[:12]
+
+
+recipe_cache = RecipeCache(max_size=int(os.environ.get("RECIPE_CACHE_SIZE", "512")))
@@ -1,14 +1,17 @@
 from typing_extensions import TypedDict
+import json
 
 class State(TypedDict):
     language: str
     message: str
     enMessage: str
     preferences: dict[str, str]
-    enRecipeOptions: dict
+    # Handles into the RecipeCache, the recipes themselves aren't kept in the state
+    recipeOptions: list[str]
     recipeSelected: str
-    translatedRecipeOptions: str
     imageGenerated: bool
-    selectedRecipeDescription: str
     response: str
-    suggestedDescription: str
+
+def serialized_size(state: dict) -> int:
+    """Size in bytes of the state serialized as JSON, which is roughly what a checkpoint stores."""
+    return len(json.dumps(state, ensure_ascii=False, default=str).encode("utf-8"))
@@ -0,0 +1,148 @@
+"""Compares the vector backends on the loaded recipes.
+
+    # Copies the embeddings already stored in Chroma into the numpy index
+    python3 benchmark.py build-numpy --dtype int8 --clusters 2048
+
+    # Measures recall@10 against an exact search, latency and resident memory
+    python3 benchmark.py run --queries 200
+
+Each backend is measured in its own process so that resident memory isn't shared.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from vector_backends import create_backend
+
+K = 10
+BATCH_SIZE = 5000
+
+
+def chroma_batches(include):
+    backend = create_backend("chroma")
+    total = backend.count()
+
+    for offset in range(0, total, BATCH_SIZE):
+        yield backend.collection.get(limit=BATCH_SIZE, offset=offset, include=include)
+
+
+def build_numpy(args):
+    backend = create_backend("numpy", path=args.path, dtype=args.dtype, n_clusters=args.clusters)
+
+    for batch_num, batch in enumerate(chroma_batches(["embeddings", "metadatas"]), start=1):
+        backend.add(batch["ids"], batch["embeddings"], batch["metadatas"])
+        print(f"Batch {batch_num} copied.")
+
+    backend.flush()
+    print(f"Numpy index with {backend.count()} recipes written to {args.path}")
+
+
+def exact_neighbors(queries):
+    best_ids = np.empty((len(queries), 0), dtype=object)
+    best_scores = np.empty((len(queries), 0), dtype=np.float32)
+
+    for batch in chroma_batches(["embeddings"]):
+        embeddings = np.asarray(batch["embeddings"], dtype=np.float32)
+        scores = np.concatenate([best_scores, queries @ embeddings.T], axis=1)
+        ids = np.concatenate([best_ids, np.tile(np.asarray(batch["ids"], dtype=object), (len(queries), 1))], axis=1)
+
+        top = np.argsort(-scores, axis=1)[:, :K]
+        best_scores = np.take_along_axis(scores, top, axis=1)
+        best_ids = np.take_along_axis(ids, top, axis=1)
+
+    return best_ids.tolist()
+
+
+def sample_queries(n):
+    from chromadb.utils import embedding_functions
+
+    backend = create_backend("chroma")
+    rng = np.random.default_rng(0)
+    offsets = rng.choice(backend.count(), size=n, replace=False)
+    titles = [backend.collection.get(limit=1, offset=int(offset), include=["metadatas"])["metadatas"][0]["title"] for offset in offsets]
+
+    return np.asarray(embedding_functions.DefaultEmbeddingFunction()(titles), dtype=np.float32)
+
+
+def run(args):
+    queries = sample_queries(args.queries)
+    truth = exact_neighbors(queries)
+
+    with tempfile.TemporaryDirectory() as directory:
+        queries_path = os.path.join(directory, "queries.npy")
+        np.save(queries_path, queries)
+
+        configs = [("chroma", {}), ("numpy", {"path": args.path})]
+        if args.n_probe:
+            configs.append(("numpy", {"path": args.path, "n_probe": args.n_probe}))
+
+        print(f"{'backend':<28}{'recall@10':>10}{'open (s)':>10}{'p50 (ms)':>10}{'p95 (ms)':>10}{'RSS (MB)':>10}")
+        for name, options in configs:
+            output_path = os.path.join(directory, "output.json")
+            subprocess.run([sys.executable, __file__, "worker", name, queries_path, output_path, json.dumps(options)], check=True)
+
+            with open(output_path) as f:
+                output = json.load(f)
+
+            recall = np.mean([len(set(ids) & set(expected)) / K for ids, expected in zip(output["ids"], truth)])
+            latencies = np.asarray(output["latencies"]) * 1000
+            label = name + (f" n_probe={options['n_probe']}" if "n_probe" in options else "")
+
+            print(f"{label:<28}{recall:>10.3f}{output['open']:>10.2f}{np.percentile(latencies, 50):>10.1f}"
+                  f"{np.percentile(latencies, 95):>10.1f}{output['rss'] / 1024:>10.0f}")
+
+
+def worker(name, queries_path, output_path, options):
+    queries = np.load(queries_path)
+
+    start = time.perf_counter()
+    backend = create_backend(name, **json.loads(options))
+    backend.query(queries[:1], n_results=K)
+    open_time = time.perf_counter() - start
+
+    ids = []
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        results = backend.query(query[None, :], n_results=K)
+        latencies.append(time.perf_counter() - start)
+        ids.append(results["ids"][0])
+
+    with open(output_path, "w") as f:
+        json.dump({
+            "ids": ids,
+            "latencies": latencies,
+            "open": open_time,
+            "rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            }, f)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "worker":
+        worker(*sys.argv[2:])
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = commands.add_parser("build-numpy")
+    build_parser.add_argument("--path", default="./numpy_index")
+    build_parser.add_argument("--dtype", default="int8", choices=["int8", "float16"])
+    build_parser.add_argument("--clusters", type=int, default=None)
+    build_parser.set_defaults(func=build_numpy)
+
+    run_parser = commands.add_parser("run")
+    run_parser.add_argument("--path", default="./numpy_index")
+    run_parser.add_argument("--queries", type=int, default=200)
+    run_parser.add_argument("--n-probe", type=int, default=None, help="Also measures the numpy backend with this n_probe")
+    run_parser.set_defaults(func=run)
+
+    args = parser.parse_args()
+    args.func(args)
@@ -0,0 +1,73 @@
+import asyncio
+import os
+
+# Tool calls a server process runs at once, the rest wait in line for a slot
+MAX_CONCURRENCY = int(os.environ.get("MAX_CONCURRENCY", "8"))
+
+
+class ConcurrencyLimiter:
+    """Caps the tool calls a server runs at the same time and keeps track of the queue.
+
+    Used as `async with limiter:` around the body of each tool. With wait_for(readiness), the
+    calls also wait for the warm-up of the process, and count in the queue depth meanwhile.
+    GET /metrics reports the queue depth and counters in the Prometheus text format, per
+    worker process.
+    """
+
+    def __init__(self, name: str, max_concurrency: int = MAX_CONCURRENCY):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.readiness = None
+        self.waiting = 0
+        self.warming_up = 0
+        self.running = 0
+        self.completed = 0
+        self.max_waiting = 0
+
+    def wait_for(self, readiness) -> None:
+        self.readiness = readiness
+
+    async def __aenter__(self):
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+
+        try:
+            if self.readiness is not None and not self.readiness.ready:
+                self.warming_up += 1
+                try:
+                    await self.readiness.wait_ready()
+                finally:
+                    self.warming_up -= 1
+
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.running += 1
+        return self
+
+    async def __aexit__(self, *args):
+        self.running -= 1
+        self.completed += 1
+        self.semaphore.release()
+
+    def metrics(self) -> str:
+        labels = f'server="{self.name}",pid="{os.getpid()}"'
+        values = {
+                "mcp_queue_depth": self.waiting,
+                "mcp_queue_depth_max": self.max_waiting,
+                "mcp_waiting_for_warm_up": self.warming_up,
+                "mcp_running_calls": self.running,
+                "mcp_completed_calls_total": self.completed,
+                "mcp_max_concurrency": self.max_concurrency,
+                }
+
+        return "".join(f"{metric}{{{labels}}} {value}\n" for metric, value in values.items())
+
+    def add_route(self, mcp) -> None:
+        from starlette.responses import PlainTextResponse
+
+        @mcp.custom_route("/metrics", methods=["GET"])
+        async def metrics(request):
+            return PlainTextResponse(self.metrics())
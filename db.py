@@ -1,17 +1,33 @@
-import chromadb
+from chromadb.utils import embedding_functions
 import csv
+import json
+import os
+
+from estimators import parse_list
+from lexical_index import LexicalIndex, reciprocal_rank_fusion
+from recipe_store import RecipeStore
+from vector_backends import create_backend
 
 class VectorDatabase:
-    def __init__(self, path="./chroma_db", collection_name="recipes"):
-        self.client = chromadb.PersistentClient(path=path)
-        self.collection = self.client.get_or_create_collection(name=collection_name)
+    def __init__(self, backend=None, store_path="./recipe_store", lexical_path="./lexical_index", **backend_options):
+        """Opens the recipe database.
+
+        The backend is "chroma" (default) or "numpy", and can also be set with the VECTOR_BACKEND
+        environment variable. backend_options are passed to the backend, e.g. path and
+        collection_name for Chroma or path, dtype and n_clusters for numpy.
+        """
+        self.backend_name = backend or os.environ.get("VECTOR_BACKEND", "chroma")
+        self.backend = create_backend(self.backend_name, **backend_options)
+        self.embedding_function = embedding_functions.DefaultEmbeddingFunction()
+        self.store = RecipeStore(path=store_path)
+        self.lexical = LexicalIndex(path=lexical_path)
 
     def load_data(self, csv_file="full_dataset.csv", batch_size=5000, limit=None):
         batch_documents = []
         batch_metadatas = []
         batch_ids = []
         
-        with open(csv_file, "r") as f:
+        with open(csv_file, "r") as f, self.store.writer() as store, self.lexical.writer() as lexical:
             reader = csv.reader(f)
         
             # Skip header
@@ -21,13 +37,23 @@ class VectorDatabase:
             batch_num = 0
         
             for record in reader:
+                # The store and the index were already truncated, so a bad row is skipped
+                # instead of failing the load halfway through
+                if len(record) < 4 or not record[0].strip().isdigit():
+                    print(f"Skipping malformed row: {record[:2]}")
+                    continue
+
                 recipe_id = record[0]
                 title = record[1]
                 ingredients = record[2]
                 steps = record[3]
         
-                document = f"Title: {title}\nIngredients: {ingredients}\n\nSteps: {steps}"
-                metadata = {"title": title, "ingredients": ingredients, "steps": steps}
+                # The full text only goes to the recipe store. Chroma keeps the embedding and
+                # small metadata that can be used on where filters.
+                store.append(recipe_id, title, ingredients, steps)
+                lexical.append(recipe_id, title, ingredients)
+                document = RecipeStore.format({"title": title, "ingredients": ingredients, "steps": steps})
+                metadata = {"title": title, "ingredientsCount": len(parse_list(ingredients)), "stepsCount": len(parse_list(steps))}
         
                 batch_documents.append(document)
                 batch_metadatas.append(metadata)
@@ -39,11 +65,7 @@ class VectorDatabase:
                     batch_num += 1
                     print(f"--- Adding batch {batch_num} with {batch_size} records... ---")
         
-                    self.collection.add(
-                            documents=batch_documents,
-                            metadatas=batch_metadatas,
-                            ids=batch_ids
-                            )
+                    self.add(batch_documents, batch_metadatas, batch_ids)
         
                     batch_documents = []
                     batch_metadatas = []
@@ -58,18 +80,98 @@ class VectorDatabase:
             final_batch_size = len(batch_documents)
             print(f"\n--- Adding final batch {batch_num} with {final_batch_size} records... ---")
 
-            self.collection.add(
-                    documents=batch_documents,
-                    metadatas=batch_metadatas,
-                    ids=batch_ids
-                    )
+            self.add(batch_documents, batch_metadatas, batch_ids)
             print(f"Final batch {batch_num} added successfully.")
 
-    def search(self, queries=[], where=None, where_document=None, n_results=10):
-        results = self.collection.query(
-                query_texts=queries,
-                where=where,
-                where_document=where_document,
-                n_results=n_results
-                )
+        self.backend.flush()
+
+    def enrich(self, estimator, batch_size=1000, checkpoint_every=50, progress_file="./enrichment_progress.json", restart=False):
+        """Stores the estimator's time, calories and complexity estimates as metadata of every recipe.
+
+        Progress is saved every checkpoint_every batches, so an interrupted run continues from the last
+        checkpoint instead of starting over. Recipes that already have estimates from the same estimator
+        are skipped, so the batches Chroma persisted after the last checkpoint aren't estimated again
+        (restart=True estimates every recipe again).
+        """
+        start = 0
+        if not restart and os.path.exists(progress_file):
+            with open(progress_file) as f:
+                progress = json.load(f)
+            if progress["estimator"] == estimator.name:
+                start = progress["row"]
+                print(f"--- Resuming enrichment from recipe {start} ---")
+
+        for batch_num, (next_row, recipes) in enumerate(self.store.scan(start, batch_size), start=1):
+            ids = [recipe["id"] for recipe in recipes]
+            current = self.backend.get(ids)
+            metadatas = dict(zip(current["ids"], current["metadatas"]))
+            pending = [recipe for recipe in recipes if recipe["id"] in metadatas and (restart or metadatas[recipe["id"]].get("estimatedBy") != estimator.name)]
+
+            if pending:
+                estimates = estimator.estimate(pending)
+                self.backend.update([recipe["id"] for recipe in pending], [metadatas[recipe["id"]] | estimate for recipe, estimate in zip(pending, estimates)])
+
+            if batch_num % checkpoint_every == 0 or next_row == len(self.store):
+                self.backend.flush()
+                with open(progress_file, "w") as f:
+                    json.dump({"estimator": estimator.name, "row": next_row}, f)
+                print(f"Enriched {next_row} of {len(self.store)} recipes.")
+
+    def add(self, documents, metadatas, ids):
+        # Embeddings are computed here so that the backend doesn't persist the documents
+        self.backend.add(ids, self.embedding_function(documents), metadatas)
+
+    def search(self, queries=[], where=None, n_results=10, hydrate=True, lexical=True):
+        """Searches the recipes for each query.
+
+        Each result has a "scores" list (higher is better). When the lexical index exists, vector
+        and BM25 hits are merged with reciprocal rank fusion and the scores are the fused ones,
+        otherwise they're the cosine similarities next to the backend's "distances".
+        Recipes whose title is exactly the query are fused as a third ranking, so they lead the
+        results, and those queries aren't embedded.
+        """
+        if isinstance(queries, str):
+            queries = [queries]
+
+        if not (lexical and self.lexical.exists()):
+            results = self.backend.query(self.embedding_function(queries), n_results=n_results, where=where)
+            # Squared L2 distances between normalized embeddings
+            results["scores"] = [[1.0 - distance / 2 for distance in distances] for distances in results["distances"]]
+        else:
+            results = self.hybrid_search(queries, where, n_results)
+
+        if hydrate:
+            results["documents"] = [self.documents(ids) for ids in results["ids"]]
+
         return results
+
+    def hybrid_search(self, queries, where, n_results):
+        n_candidates = n_results * 2
+        exact_ids = [self.lexical.exact_title(query, n_results=n_candidates) for query in queries]
+
+        vector_ids = [[] for _ in queries]
+        to_embed = [i for i, ids in enumerate(exact_ids) if not ids]
+        if to_embed:
+            embeddings = self.embedding_function([queries[i] for i in to_embed])
+            found = self.backend.query(embeddings, n_results=n_candidates, where=where)
+            for position, i in enumerate(to_embed):
+                vector_ids[i] = found["ids"][position]
+
+        results = {"ids": [], "metadatas": [], "scores": []}
+        for i, query in enumerate(queries):
+            lexical_ids, _ = self.lexical.search(query, n_results=n_candidates)
+            scores = dict(reciprocal_rank_fusion([exact_ids[i], vector_ids[i], lexical_ids]))
+
+            # Lexical hits haven't gone through the where filter yet
+            found = self.backend.get(list(scores), where=where)
+            ids = found["ids"][:n_results]
+
+            results["ids"].append(ids)
+            results["metadatas"].append(found["metadatas"][:n_results])
+            results["scores"].append([scores[recipe_id] for recipe_id in ids])
+
+        return results
+
+    def documents(self, ids):
+        """Loads the full text of the given recipes from the recipe store."""
+        return self.store.documents(ids)
@@ -0,0 +1,9 @@
+import sys
+
+from db import VectorDatabase
+from estimators import create_estimator
+
+# python3 enrich_data.py [heuristic|llm] [--restart]
+estimator = create_estimator(sys.argv[1] if len(sys.argv) > 1 and not sys.argv[1].startswith("--") else "heuristic")
+
+VectorDatabase().enrich(estimator, restart="--restart" in sys.argv)
@@ -0,0 +1,149 @@
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*(?:-\s*\d+\s*)?(hours?|hrs?|minutes?|mins?)\b")
+
+RICH_INGREDIENTS = ["butter", "oil", "sugar", "cream", "cheese", "bacon", "sausage", "chocolate", "mayonnaise",
+                    "pastry", "shortening", "lard", "nuts", "peanut", "coconut", "condensed milk", "beef", "pork"]
+LIGHT_INGREDIENTS = ["lettuce", "spinach", "cucumber", "tomato", "zucchini", "celery", "broth", "lemon", "herbs",
+                     "vinegar", "cabbage", "broccoli", "mushroom", "fish", "chicken breast", "egg white"]
+
+
+def parse_list(text):
+    try:
+        values = json.loads(text)
+        return values if isinstance(values, list) else [text]
+    except ValueError:
+        return [text] if text else []
+
+
+def time_bucket(minutes):
+    if minutes <= 30:
+        return "short"
+    if minutes <= 75:
+        return "moderate"
+    return "long"
+
+
+def complexity_bucket(n_steps, n_ingredients):
+    score = n_steps + 0.5 * n_ingredients
+    if score <= 8:
+        return "easy"
+    if score <= 16:
+        return "medium"
+    return "hard"
+
+
+def calories_bucket(calories):
+    if calories < 350:
+        return "low"
+    if calories < 650:
+        return "medium"
+    return "high"
+
+
+def attributes(minutes, calories, complexity, estimator):
+    """Builds the metadata stored for a recipe. Bucket names match the preference enums."""
+    return {
+            "minutesToPrepare": int(minutes),
+            "caloriesPerServing": int(calories),
+            "timeSpentCooking": time_bucket(minutes),
+            "caloriesPreference": calories_bucket(calories),
+            "complexity": complexity,
+            "estimatedBy": estimator,
+            }
+
+
+class HeuristicEstimator:
+    """Estimates time, calories and complexity from the recipe text alone.
+
+    Time adds a few minutes per step and ingredient to the durations written in the steps,
+    and calories start from an average serving that rich and light ingredients move up or down.
+    """
+
+    name = "heuristic"
+
+    def estimate(self, recipes: list[dict]) -> list[dict]:
+        return [self.estimate_one(recipe) for recipe in recipes]
+
+    def estimate_one(self, recipe: dict) -> dict:
+        ingredients = parse_list(recipe["ingredients"])
+        steps = parse_list(recipe["steps"])
+        ingredients_text = " ".join(ingredients).lower()
+
+        written_minutes = 0.0
+        for amount, unit in DURATION_PATTERN.findall(" ".join(steps).lower()):
+            written_minutes += float(amount) * (60 if unit.startswith("h") else 1)
+
+        minutes = 5 + 3 * len(steps) + len(ingredients) + min(written_minutes, 24 * 60)
+
+        rich = sum(1 for ingredient in RICH_INGREDIENTS if ingredient in ingredients_text)
+        light = sum(1 for ingredient in LIGHT_INGREDIENTS if ingredient in ingredients_text)
+        calories = min(max(300 + 70 * rich - 40 * light + 10 * len(ingredients), 80), 1500)
+
+        return attributes(minutes, calories, complexity_bucket(len(steps), len(ingredients)), self.name)
+
+
+class LLMEstimator:
+    """Asks the LLM for the estimates of a whole batch of recipes in one call.
+
+    Recipes missing from the answer, or batches whose answer can't be parsed, fall back to
+    the heuristic estimates.
+    """
+
+    name = "llm"
+
+    def __init__(self, batch_size: int = 20):
+        from llm import LLM
+
+        self.batch_size = batch_size
+        self.llm = LLM(temperature=0.0)
+        self.fallback = HeuristicEstimator()
+
+    def estimate(self, recipes: list[dict]) -> list[dict]:
+        estimates = []
+        for start in range(0, len(recipes), self.batch_size):
+            estimates += self.estimate_batch(recipes[start:start + self.batch_size])
+        return estimates
+
+    def estimate_batch(self, recipes: list[dict]) -> list[dict]:
+        listing = "\n\n".join(f"ID: {recipe['id']}\nTitle: {recipe['title']}\nIngredients: {recipe['ingredients']}\nSteps: {recipe['steps']}" for recipe in recipes)
+        prompt = f"""
+        For each of the following recipes, estimate the calories per serving, the total minutes to prepare it and its
+        complexity (easy, medium or hard). Return only a JSON array with one item per recipe in the format:
+        {{ "id": "recipe ID", "caloriesPerServing": number, "minutesToPrepare": number, "complexity": "easy" | "medium" | "hard" }}
+
+        Recipes:
+        {listing}
+        """
+
+        try:
+            response = self.llm.model().invoke(prompt)
+            answers = {str(answer["id"]): answer for answer in json.loads(response.text.replace("```json", "").replace("```", ""))}
+        except Exception as e:
+            logger.info(f"Couldn't parse the LLM estimates, using the heuristic for {len(recipes)} recipes: {e}")
+            answers = {}
+
+        estimates = []
+        for recipe in recipes:
+            answer = answers.get(recipe["id"])
+            try:
+                if answer["complexity"] not in ("easy", "medium", "hard"):
+                    raise ValueError(f"Unknown complexity {answer['complexity']}")
+                estimates.append(attributes(float(answer["minutesToPrepare"]), float(answer["caloriesPerServing"]), answer["complexity"], self.name))
+            except (KeyError, TypeError, ValueError):
+                estimates.append(self.fallback.estimate_one(recipe))
+
+        return estimates
+
+
+def create_estimator(name, **kwargs):
+    if name == "heuristic":
+        return HeuristicEstimator()
+    if name == "llm":
+        return LLMEstimator(**kwargs)
+
+    raise ValueError(f"Unknown estimator: {name}")
@@ -0,0 +1,228 @@
+import hashlib
+import json
+import math
+import os
+import re
+
+import numpy as np
+
+STOPWORDS = {
+        "a", "an", "and", "the", "of", "with", "in", "on", "for", "to", "or", "my", "s",
+        "c", "tsp", "tbsp", "tablespoon", "tablespoons", "teaspoon", "teaspoons", "cup", "cups",
+        "oz", "lb", "lbs", "pkg", "can", "g", "kg", "ml", "large", "small", "medium",
+        }
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower().replace("'", "")) if token not in STOPWORDS and not token.isdigit()]
+
+
+def normalize_title(title):
+    return " ".join(TOKEN_PATTERN.findall(title.lower().replace("'", "")))
+
+
+def title_hash(title):
+    return int.from_bytes(hashlib.blake2b(normalize_title(title).encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+
+class LexicalIndex:
+    """BM25 inverted index over recipe titles and ingredients, built next to the vector index.
+
+    Postings are stored as one array sorted by term and memory-mapped on open. Title terms
+    count TITLE_WEIGHT times so that a dish name outweighs a recipe that just uses the same
+    ingredient. Titles are also hashed so that an exact title can be found without scoring.
+    """
+
+    TITLE_WEIGHT = 3
+    K1 = 1.2
+    B = 0.75
+    SPILL_SIZE = 1000000
+
+    def __init__(self, path="./lexical_index"):
+        self.path = path
+        self._writer = None
+        self._index = None
+
+    def writer(self):
+        os.makedirs(self.path, exist_ok=True)
+        self.close()
+        self._writer = {"vocabulary": {}, "terms": [], "rows": [], "frequencies": [], "lengths": [], "ids": [], "titles": [], "chunks": []}
+        return self
+
+    def append(self, recipe_id, title, ingredients):
+        writer = self._writer
+        row = len(writer["ids"])
+        frequencies = {}
+
+        for token in tokenize(title):
+            frequencies[token] = frequencies.get(token, 0) + self.TITLE_WEIGHT
+        for token in tokenize(ingredients):
+            frequencies[token] = frequencies.get(token, 0) + 1
+
+        for token, frequency in frequencies.items():
+            writer["terms"].append(writer["vocabulary"].setdefault(token, len(writer["vocabulary"])))
+            writer["rows"].append(row)
+            writer["frequencies"].append(frequency)
+
+        writer["lengths"].append(sum(frequencies.values()))
+        writer["ids"].append(int(recipe_id))
+        writer["titles"].append(title_hash(title))
+
+        if len(writer["terms"]) >= self.SPILL_SIZE:
+            self._spill()
+
+    def _spill(self):
+        # Python lists of ints take several times the memory of the arrays, which adds up
+        # to gigabytes over the full dataset
+        writer = self._writer
+        writer["chunks"].append((
+            np.asarray(writer["terms"], dtype=np.int32),
+            np.asarray(writer["rows"], dtype=np.int32),
+            np.asarray(writer["frequencies"], dtype=np.uint16),
+            ))
+        writer["terms"], writer["rows"], writer["frequencies"] = [], [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.flush()
+
+    def flush(self):
+        if self._writer is None:
+            return
+
+        self._spill()
+        writer = self._writer
+        terms = np.concatenate([chunk[0] for chunk in writer["chunks"]])
+        order = np.argsort(terms, kind="stable")
+
+        np.save(self._file("postings_rows.npy"), np.concatenate([chunk[1] for chunk in writer["chunks"]])[order])
+        np.save(self._file("postings_frequencies.npy"), np.concatenate([chunk[2] for chunk in writer["chunks"]])[order])
+        np.save(self._file("term_offsets.npy"), np.searchsorted(terms[order], np.arange(len(writer["vocabulary"]) + 1)).astype(np.int64))
+        np.save(self._file("lengths.npy"), np.asarray(writer["lengths"], dtype=np.int32))
+        np.save(self._file("ids.npy"), np.asarray(writer["ids"], dtype=np.int64))
+
+        titles = np.asarray(writer["titles"], dtype=np.int64)
+        title_order = np.argsort(titles, kind="stable")
+        np.save(self._file("title_hashes.npy"), titles[title_order])
+        np.save(self._file("title_rows.npy"), title_order.astype(np.int32))
+
+        with open(self._file("vocabulary.json"), "w") as f:
+            json.dump(writer["vocabulary"], f)
+
+        self._writer = None
+
+    def exists(self):
+        return os.path.exists(self._file("vocabulary.json"))
+
+    def close(self):
+        self.flush()
+        self._index = None
+
+    def exact_title(self, query, n_results=10):
+        """Returns the IDs of the recipes whose normalized title is the query, best BM25 score first.
+
+        Common titles are shared by thousands of recipes, so only the best n_results are returned.
+        """
+        index = self._open()
+        if not normalize_title(query):
+            return []
+
+        key = title_hash(query)
+        start = np.searchsorted(index["title_hashes"], key, side="left")
+        end = np.searchsorted(index["title_hashes"], key, side="right")
+        rows = np.sort(index["title_rows"][start:end])
+
+        scores = np.zeros(len(rows), dtype=np.float32)
+        for term_id in self._term_ids(query):
+            matched, contributions = self._bm25(term_id, rows)
+            scores[matched] += contributions
+
+        top = np.argsort(-scores, kind="stable")[:n_results]
+        return [str(index["ids"][row]) for row in rows[top]]
+
+    def search(self, query, n_results=10):
+        """Returns the IDs and BM25 scores of the best matching recipes."""
+        index = self._open()
+        term_ids = self._term_ids(query)
+        if not term_ids:
+            return [], []
+
+        scores = np.zeros(len(index["lengths"]), dtype=np.float32)
+        for term_id in term_ids:
+            rows, contributions = self._bm25(term_id)
+            scores[rows] += contributions
+
+        n_results = min(n_results, int(np.count_nonzero(scores)))
+        if n_results == 0:
+            return [], []
+
+        top = np.argpartition(-scores, n_results - 1)[:n_results]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        return [str(index["ids"][row]) for row in top], scores[top].tolist()
+
+    def _term_ids(self, query):
+        vocabulary = self._open()["vocabulary"]
+        return {vocabulary[token] for token in tokenize(query) if token in vocabulary}
+
+    def _bm25(self, term_id, rows=None):
+        """Returns the rows that have the term and its BM25 contribution to each.
+
+        With rows, only those rows are scored and the returned positions index into rows.
+        """
+        index = self._open()
+        start, end = index["term_offsets"][term_id], index["term_offsets"][term_id + 1]
+        posting_rows = index["postings_rows"][start:end]
+        frequencies = index["postings_frequencies"][start:end]
+        idf = math.log(1 + (len(index["lengths"]) - len(posting_rows) + 0.5) / (len(posting_rows) + 0.5))
+
+        if rows is None:
+            matched = posting_rows
+        else:
+            # Postings of a term are sorted by row
+            positions = np.minimum(np.searchsorted(posting_rows, rows), max(len(posting_rows) - 1, 0))
+            found = posting_rows[positions] == rows if len(posting_rows) else np.zeros(len(rows), dtype=bool)
+            matched, frequencies, posting_rows = np.flatnonzero(found), frequencies[positions[found]], rows[found]
+
+        frequencies = frequencies.astype(np.float32)
+        norm = self.K1 * (1 - self.B + self.B * index["lengths"][posting_rows] / index["average_length"])
+        return matched, idf * frequencies * (self.K1 + 1) / (frequencies + norm)
+
+    def _open(self):
+        if self._index is not None:
+            return self._index
+
+        with open(self._file("vocabulary.json")) as f:
+            vocabulary = json.load(f)
+
+        lengths = np.load(self._file("lengths.npy"), mmap_mode="r")
+        self._index = {
+                "vocabulary": vocabulary,
+                "postings_rows": np.load(self._file("postings_rows.npy"), mmap_mode="r"),
+                "postings_frequencies": np.load(self._file("postings_frequencies.npy"), mmap_mode="r"),
+                "term_offsets": np.load(self._file("term_offsets.npy"), mmap_mode="r"),
+                "lengths": lengths,
+                "average_length": max(float(np.mean(lengths)), 1.0) if len(lengths) else 1.0,
+                "ids": np.load(self._file("ids.npy"), mmap_mode="r"),
+                "title_hashes": np.load(self._file("title_hashes.npy"), mmap_mode="r"),
+                "title_rows": np.load(self._file("title_rows.npy"), mmap_mode="r"),
+                }
+
+        return self._index
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuses ranked lists of IDs, returning (id, score) pairs from best to worst."""
+    scores = {}
+    for ranking in rankings:
+        for rank, recipe_id in enumerate(ranking):
+            scores[recipe_id] = scores.get(recipe_id, 0.0) + 1.0 / (k + rank + 1)
+
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
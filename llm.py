@@ -1,9 +1,31 @@
-from langchain.chat_models import init_chat_model
-import os
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
 
 class LLM:
+    # Chat models are shared per temperature, so the client is only created once per process
+    _models = {}
+    _lock = threading.Lock()
+
     def __init__(self, temperature: float = 0.0):
-        self.llm = init_chat_model("google_genai:gemini-2.5-flash-lite", temperature=temperature)
+        with LLM._lock:
+            if temperature not in LLM._models:
+                from langchain.chat_models import init_chat_model
+
+                LLM._models[temperature] = init_chat_model("google_genai:gemini-2.5-flash-lite", temperature=temperature)
+
+        self.llm = LLM._models[temperature]
 
     def model(self):
         return self.llm
+
+    def warm_up(self) -> None:
+        """Sends a minimal request so the connection and credentials are set up before the first user.
+
+        A failure is only logged, the server can still answer and the first request retries the connection.
+        """
+        try:
+            self.llm.invoke("Reply with OK.")
+        except Exception as e:
+            logger.warning(f"LLM warm-up request failed: {e}")
@@ -1,12 +1,18 @@
+import time
+import_started = time.perf_counter()
+
 from fastmcp import FastMCP
 import sys
 import os
 import json
-import time
+import threading
+import asyncio
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from llm import LLM
-from db import VectorDatabase
+from readiness import Readiness
+from concurrency import ConcurrencyLimiter
+from preferences import candidate_scores, preference_filters, search_queries, with_estimates
 
 import logging
 
@@ -14,8 +20,36 @@ logging.basicConfig(level=os.environ.get("LOGLEVEL", "INFO"))
 logger = logging.getLogger(__name__)
 
 mcp = FastMCP(name="Food Server")
+limiter = ConcurrencyLimiter(mcp.name)
+
+# Recipes sent to the LLM after the local reranking. With 3 the LLM only enriches the final
+# recipes, with more it also picks the best 3 among them.
+LLM_CANDIDATES = int(os.environ.get("LLM_CANDIDATES", "3"))
+RECOMMENDATIONS = 3
+# Candidates retrieved per query for the local reranking
+SEARCH_CANDIDATES = int(os.environ.get("SEARCH_CANDIDATES", "10"))
+
+_db = None
+_db_lock = threading.Lock()
 
-db = VectorDatabase()
+def get_db():
+    # chromadb and the embedding model are slow to import, so they're only loaded by the
+    # warm-up or the first request instead of when the server is imported
+    global _db
+    with _db_lock:
+        if _db is None:
+            from db import VectorDatabase
+            _db = VectorDatabase()
+    return _db
+
+_reranker = None
+
+def get_reranker():
+    global _reranker
+    if _reranker is None:
+        from reranker import Reranker
+        _reranker = Reranker(get_db(), diversity=float(os.environ.get("RERANK_DIVERSITY", "0.3")))
+    return _reranker
 
 assistant = f"""
     You're an assistant chef that helps people find the best recipe given their instructions. You figure out if they need a recipe, suggest recipes
@@ -78,7 +112,7 @@ preferences_schema = {
 }
 
 @mcp.tool()
-def define_preferences(text: str) -> str:
+async def define_preferences(text: str) -> str:
     """Defines food preferences for a given text."""
     prompt = f"""
         {assistant}
@@ -89,12 +123,13 @@ def define_preferences(text: str) -> str:
             {preferences_schema}
     """
 
-    response = LLM(temperature=0.0).model().invoke(prompt)
+    async with limiter:
+        response = await LLM(temperature=0.0).model().ainvoke(prompt)
 
     return response.text()
 
 @mcp.tool()
-def update_preferences(currentPreferences: dict, updatedRequest: str, suggestions: list) -> str:
+async def update_preferences(currentPreferences: dict, updatedRequest: str, suggestions: list) -> str:
     """Updates food preferences based on user feedback."""
     prompt = f"""
         {assistant}
@@ -110,42 +145,43 @@ def update_preferences(currentPreferences: dict, updatedRequest: str, suggestion
         Schema: {preferences_schema}
     """
 
-    response = LLM(temperature=0.0).model().invoke(prompt)
+    async with limiter:
+        response = await LLM(temperature=0.0).model().ainvoke(prompt)
 
     return response.text()
         
 
 @mcp.tool()
-def find_matches(preferences: dict) -> list:
+async def find_matches(preferences: dict) -> list:
     """Finds recipe matches based on food preferences."""
-    recommendations = get_matches(preferences)
-    logger.info(f"Raw recommendations: {recommendations}")
-    formatted_recommendations = to_json(recommendations)
+    async with limiter:
+        # Searching and reranking block on the index and the embedding model, so they run in a thread
+        documents = await asyncio.to_thread(select_recipes, preferences)
+        if not documents:
+            # Nothing for the LLM to describe, and it would make up recipes that weren't checked
+            logger.info("No recipes respect the preferences")
+            return []
+
+        recommendations = await get_matches(preferences, documents)
+        logger.info(f"Raw recommendations: {recommendations}")
+        formatted_recommendations = await to_json(recommendations)
     logger.info(f"Formatted recommendations: {formatted_recommendations}")
 
     return formatted_recommendations
 
-def get_matches(preferences: dict) -> str:
-    strs = [
-           preferences.get('diet', None),
-           preferences.get('cuisine', None),
-           preferences.get('mealType', None),
-           f"using {''.join(preferences['includeIngredients'])}" if preferences.get('includeIngredients', None) else None,
-           f"without {''.join(preferences['excludeIngredients'])}" if preferences.get('excludeIngredients', None) else None]
-
-    text = " ".join(s.strip() for s in strs if s and s.strip())
-    reference = preferences['references']
-
-    results = db.search([reference, text], n_results=10)
-    documents = results['documents']
+async def get_matches(preferences: dict, documents: list[str]) -> str:
+    if len(documents) > RECOMMENDATIONS:
+        task = f"""Based on the following preferences and search results, find the {RECOMMENDATIONS} best matching recipes. If two or more
+    recipes are very similar, exclude the duplicates."""
+    else:
+        task = "The following recipes were selected for the preferences below. Describe each one of them."
 
     prompt = f"""
     {assistant}
 
-    Based on the following preferences and search results, find the three best matching recipe. If the recipe doesn't respect the constraints 
-    (e.g. it includes dairy when it should be dairy free), do not recommend it or suggest substitutions. Estimate the calories per serving and
-    time to prepare the recipe to help with the decision. If two or more recipes are very similar, exclude the duplicates. Consider the ingredients
-    and steps, and include them in the result.
+    {task} The recipes already respect the user's constraints. Use the calories per serving and
+    time to prepare given with each recipe, and only estimate them when they're missing. Consider the ingredients and steps,
+    and include them in the result.
 
     Preferences: 
         {preferences}
@@ -156,9 +192,40 @@ def get_matches(preferences: dict) -> str:
     Think step by step to ensure the best results.
     """
 
-    return LLM(temperature=0.0).model().invoke(prompt).text
+    response = await LLM(temperature=0.0).model().ainvoke(prompt)
+    return response.text
+
+def select_recipes(preferences: dict) -> list[str]:
+    db = get_db()
+    queries = search_queries(preferences)
+    where = preference_filters(preferences)
+    scores = candidate_scores(db.search(queries, where=where, n_results=SEARCH_CANDIDATES, hydrate=False))
+    selected = rerank(preferences, queries, scores)
+
+    # The filters can leave too few candidates, or only ones that break the constraints
+    if where and (len(scores) < RECOMMENDATIONS or not selected):
+        logger.info(f"{len(selected)} of the {len(scores)} recipes matching {where} were selected, searching without the filters")
+        scores = candidate_scores(db.search(queries, n_results=SEARCH_CANDIDATES, hydrate=False))
+        selected = rerank(preferences, queries, scores)
+
+    ids = list(scores)
+    if not selected:
+        logger.info(f"None of the {len(ids)} candidates respect the constraints")
+        return []
+
+    found = db.backend.get(selected)
+    estimates = dict(zip(found["ids"], found["metadatas"]))
+    documents = [with_estimates(document, estimates.get(recipe_id, {})) for recipe_id, document in zip(selected, db.documents(selected)) if document]
 
-def to_json(recommendations: str) -> list:
+    local_share = (len(ids) - len(selected)) / max(len(ids) - RECOMMENDATIONS, 1)
+    logger.info(f"Sending {len(documents)} of {len(ids)} candidates to the LLM, {min(local_share, 1.0):.0%} of the selection done locally")
+
+    return documents
+
+def rerank(preferences: dict, queries: list[str], scores: dict) -> list[str]:
+    return get_reranker().rerank(preferences, " ".join(queries), list(scores), n_results=max(LLM_CANDIDATES, RECOMMENDATIONS), scores=scores)
+
+async def to_json(recommendations: str) -> list:
     format_prompt = f"""
     Format the following recipe recommendations into a JSON array. Each recommendation should have the following fields:
     {{ 
@@ -186,9 +253,22 @@ def to_json(recommendations: str) -> list:
     {recommendations}
     """ 
 
-    response = LLM(temperature=0.0).model().invoke(format_prompt)
+    response = await LLM(temperature=0.0).model().ainvoke(format_prompt)
     return json.loads(response.text.replace("```json", "").replace("```", ""))
 
+readiness = Readiness(mcp.name, import_started)
+readiness.add_route(mcp)
+limiter.add_route(mcp)
+limiter.wait_for(readiness)
+readiness.start({
+    "vector_database": get_db,
+    "embedding_model": lambda: get_db().embedding_function(["warm up"]),
+    "index": lambda: get_db().search(["warm up"], n_results=1),
+    "reranker": get_reranker,
+    "llm": lambda: LLM(temperature=0.0).warm_up(),
+    })
+
+app = mcp.http_app(stateless_http=True)
 
 if __name__ == "__main__":
     print("\n--- Starting FastMCP Server via __main__ ---")
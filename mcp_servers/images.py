@@ -1,12 +1,14 @@
+import time
+import_started = time.perf_counter()
+
 from fastmcp import FastMCP
 import sys
 import os
-import time
+import threading
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from google import genai
-from google.genai import types
-from io import BytesIO
+from readiness import Readiness
+from concurrency import ConcurrencyLimiter
 
 import base64
 
@@ -15,20 +17,35 @@ import logging
 logging.basicConfig(level=os.environ.get("LOGLEVEL", "ERROR"))
 
 mcp = FastMCP(name="Images Server")
+limiter = ConcurrencyLimiter(mcp.name, max_concurrency=int(os.environ.get("MAX_CONCURRENCY", "4")))
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    # google.genai is only imported by the warm-up or the first request
+    global _client
+    with _client_lock:
+        if _client is None:
+            from google import genai
+            _client = genai.Client()
+    return _client
 
 @mcp.tool()
-def generate_image(text: str, additional_instructions: str) -> str:
+async def generate_image(text: str, additional_instructions: str) -> str:
     """Generates an image based on the given text description."""
     prompt = f"{additional_instructions}\nGenerate a detailed image for the following description:\n\n{text}"
-    client = genai.Client()
+    from google.genai import types
 
-    response = client.models.generate_images(
-        model="models/imagen-3.0-generate-002",
-        prompt=prompt,
-        config=types.GenerateImagesConfig(
-            number_of_images= 1,
+    async with limiter:
+        client = get_client()
+        response = await client.aio.models.generate_images(
+            model="models/imagen-3.0-generate-002",
+            prompt=prompt,
+            config=types.GenerateImagesConfig(
+                number_of_images= 1,
+            )
         )
-    )
     return [encode_image_to_base64(generated_image.image) for generated_image in response.generated_images][0]
 
 def encode_image_to_base64(image) -> str:
@@ -37,6 +54,14 @@ def encode_image_to_base64(image) -> str:
 
     return img_str
 
+readiness = Readiness(mcp.name, import_started)
+readiness.add_route(mcp)
+limiter.add_route(mcp)
+limiter.wait_for(readiness)
+readiness.start({"genai_client": get_client})
+
+app = mcp.http_app(stateless_http=True)
+
 if __name__ == "__main__":
     print("\n--- Starting FastMCP Server via __main__ ---")
     # This starts the server, typically using the stdio transport by default
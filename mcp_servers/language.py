@@ -1,29 +1,36 @@
+import time
+import_started = time.perf_counter()
+
 from fastmcp import FastMCP
 import sys
 import os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from llm import LLM
+from readiness import Readiness
+from concurrency import ConcurrencyLimiter
 
 import logging
 
 logging.basicConfig(level=os.environ.get("LOGLEVEL", "ERROR"))
 
 mcp = FastMCP(name="Language Server")
+limiter = ConcurrencyLimiter(mcp.name)
 
 @mcp.tool()
-def find_language(text: str) -> str:
+async def find_language(text: str) -> str:
     """Find the language of the given text."""
     prompt = f"""
     Identify the language of the following text. Only return its name. If you can't determine the language, assume it's N/A.
     {text}
     """
-    response = LLM(temperature=0.0).model().invoke(prompt)
+    async with limiter:
+        response = await LLM(temperature=0.0).model().ainvoke(prompt)
 
     return response.text()
 
 @mcp.tool()
-def translate(text: str, fromLanguage: str, toLanguage: str, formatting: str = "keep formatting") -> str:
+async def translate(text: str, fromLanguage: str, toLanguage: str, formatting: str = "keep formatting") -> str:
     """Translate text from one language to another."""
     if fromLanguage.lower() == toLanguage.lower():
         return text
@@ -33,10 +40,19 @@ def translate(text: str, fromLanguage: str, toLanguage: str, formatting: str = "
     translated and {formatting}.
     {text}
     """
-    response = LLM(temperature=0.0).model().invoke(prompt)
+    async with limiter:
+        response = await LLM(temperature=0.0).model().ainvoke(prompt)
 
     return response.text()
 
+readiness = Readiness(mcp.name, import_started)
+readiness.add_route(mcp)
+limiter.add_route(mcp)
+limiter.wait_for(readiness)
+readiness.start({"llm": lambda: LLM(temperature=0.0).warm_up()})
+
+app = mcp.http_app(stateless_http=True)
+
 if __name__ == "__main__":
     print("\n--- Starting FastMCP Server via __main__ ---")
     # This starts the server, typically using the stdio transport by default
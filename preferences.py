@@ -0,0 +1,49 @@
+# Values of the enriched metadata (see enrich_data.py) accepted for each preference. "long",
+# "hard" and "high" don't filter anything.
+PREFERENCE_FILTERS = {
+        "timeSpentCooking": {"short": ["short"], "moderate": ["short", "moderate"]},
+        "complexity": {"easy": ["easy"], "medium": ["easy", "medium"]},
+        "caloriesPreference": {"low": ["low"], "medium": ["low", "medium"]},
+        }
+
+
+def search_queries(preferences: dict) -> list[str]:
+    """Builds the search queries for the preferences: the references, then the other wishes if there are any."""
+    strs = [
+           preferences.get('diet', None),
+           preferences.get('cuisine', None),
+           preferences.get('mealType', None),
+           f"using {', '.join(preferences['includeIngredients'])}" if preferences.get('includeIngredients', None) else None]
+    # The excluded ingredients are left out of the queries: BM25 would rank the recipes that have
+    # them highest, and the reranker already drops those recipes
+
+    text = " ".join(s.strip() for s in strs if s and s.strip())
+    reference = preferences['references']
+
+    return [reference, text] if text else [reference]
+
+
+def candidate_scores(results: dict) -> dict:
+    """Merges the hits of every query into recipe ID -> best search score, in order of first appearance."""
+    # Both queries often return the same recipes, so each hit is only considered once
+    scores = {}
+    for query_ids, query_scores in zip(results['ids'], results['scores']):
+        for recipe_id, score in zip(query_ids, query_scores):
+            scores[recipe_id] = max(score, scores.get(recipe_id, score))
+    return scores
+
+
+def preference_filters(preferences: dict) -> dict | None:
+    """Turns the time, complexity and calories preferences into a where filter on the enriched metadata."""
+    clauses = [{key: {"$in": allowed[preferences[key]]}} for key, allowed in PREFERENCE_FILTERS.items() if preferences.get(key) in allowed]
+
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def with_estimates(document: str, metadata: dict) -> str:
+    if "caloriesPerServing" not in metadata:
+        return document
+
+    return f"{document}\nCalories per serving: {metadata['caloriesPerServing']} kcal\nTime to prepare: {metadata['minutesToPrepare']} minutes"
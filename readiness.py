@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds, can be overridden per container
+IMPORT_TIME_BUDGET = float(os.environ.get("IMPORT_TIME_BUDGET", "2.0"))
+STARTUP_TIME_BUDGET = float(os.environ.get("STARTUP_TIME_BUDGET", "30.0"))
+
+
+class Readiness:
+    """Runs a server's warm-up steps in the background and reports its progress.
+
+    The MCP servers open their port as soon as they're imported, but only report themselves
+    as ready once every step (loading the embedder, opening the index, creating the LLM
+    clients...) has finished, so traffic can be held back until then.
+    """
+
+    def __init__(self, name: str, import_started: float):
+        self.name = name
+        self.import_started = import_started
+        self.import_seconds = time.perf_counter() - import_started
+        self.status = "starting"
+        self.steps = {}
+        self.error = None
+        self.startup_seconds = None
+        self._thread = None
+        self._waiters = []
+        self._lock = threading.Lock()
+
+        if self.import_seconds > IMPORT_TIME_BUDGET:
+            logger.warning(f"{name} took {self.import_seconds:.2f}s to import, over the {IMPORT_TIME_BUDGET}s budget")
+
+    def start(self, steps: dict) -> None:
+        """Runs the given steps, a mapping of name to callable, in a background thread."""
+        if self._thread is not None:
+            return
+
+        self.status = "warming_up"
+        self._thread = threading.Thread(target=self._warm_up, args=(steps,), name=f"{self.name} warm-up", daemon=True)
+        self._thread.start()
+
+    def wait(self, timeout: float = None) -> bool:
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.ready
+
+    async def wait_ready(self) -> None:
+        """Waits for this process' warm-up, raising if it failed.
+
+        With several workers behind one port, /ready is answered by whichever worker gets the
+        request, so the tools wait for their own worker instead of trusting the healthcheck.
+        Waiting doesn't hold a thread: the warm-up thread sets an event on the waiter's loop.
+        """
+        with self._lock:
+            waiting = self._thread is not None and self.status == "warming_up"
+            if waiting:
+                event = asyncio.Event()
+                self._waiters.append((asyncio.get_running_loop(), event))
+
+        if waiting:
+            await event.wait()
+
+        if not self.ready:
+            raise RuntimeError(f"{self.name} isn't ready: {self.error or self.status}")
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def report(self) -> dict:
+        return {
+                "server": self.name,
+                "status": self.status,
+                "steps": self.steps,
+                "error": self.error,
+                "importSeconds": round(self.import_seconds, 3),
+                "startupSeconds": round(self.startup_seconds, 3) if self.startup_seconds is not None else None,
+                "importBudgetSeconds": IMPORT_TIME_BUDGET,
+                "startupBudgetSeconds": STARTUP_TIME_BUDGET,
+                }
+
+    def add_route(self, mcp) -> None:
+        """Adds GET /ready to the server, answering 503 until the warm-up is done."""
+        from starlette.responses import JSONResponse
+
+        @mcp.custom_route("/ready", methods=["GET"])
+        async def ready(request):
+            return JSONResponse(self.report(), status_code=200 if self.ready else 503)
+
+    def _warm_up(self, steps: dict) -> None:
+        for step, function in steps.items():
+            started = time.perf_counter()
+
+            try:
+                function()
+            except Exception as e:
+                logger.error(f"{self.name} warm-up failed on {step}: {e}")
+                self.error = f"{step}: {e}"
+                self._finish("failed")
+                return
+
+            self.steps[step] = round(time.perf_counter() - started, 3)
+            logger.info(f"{self.name} warm-up: {step} took {self.steps[step]}s")
+
+        self.startup_seconds = time.perf_counter() - self.import_started
+        self._finish("ready")
+
+        if self.startup_seconds > STARTUP_TIME_BUDGET:
+            logger.warning(f"{self.name} took {self.startup_seconds:.2f}s to be ready, over the {STARTUP_TIME_BUDGET}s budget")
+        else:
+            logger.info(f"{self.name} ready in {self.startup_seconds:.2f}s")
+
+    def _finish(self, status: str) -> None:
+        with self._lock:
+            self.status = status
+            waiters, self._waiters = self._waiters, []
+
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The waiter's loop was closed in the meantime
+                pass
@@ -0,0 +1,159 @@
+import mmap
+import os
+
+import numpy as np
+
+
+class RecipeStore:
+    """Memory-mapped column store holding the full text of every recipe.
+
+    Each column is a single UTF-8 blob plus an offsets array, so reading one recipe
+    only touches the pages that hold it. Chroma keeps the embeddings and the light
+    metadata, and the text is fetched from here by recipe ID when it's needed.
+    """
+
+    COLUMNS = ("title", "ingredients", "steps")
+
+    def __init__(self, path="./recipe_store"):
+        self.path = path
+        self._files = None
+        self._offsets = None
+        self._ids = None
+        self._blobs = None
+        self._sorted_ids = None
+        self._rows = None
+
+    def writer(self):
+        os.makedirs(self.path, exist_ok=True)
+        self.close()
+        self._files = {column: open(self._column_path(column), "wb") for column in self.COLUMNS}
+        self._offsets = {column: [0] for column in self.COLUMNS}
+        self._ids = []
+        return self
+
+    def append(self, recipe_id, title, ingredients, steps):
+        values = {"title": title, "ingredients": ingredients, "steps": steps}
+
+        for column in self.COLUMNS:
+            encoded = values[column].encode("utf-8")
+            self._files[column].write(encoded)
+            self._offsets[column].append(self._offsets[column][-1] + len(encoded))
+
+        self._ids.append(int(recipe_id))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.flush()
+
+    def flush(self):
+        if self._files is None:
+            return
+
+        for column in self.COLUMNS:
+            self._files[column].close()
+            np.save(self._offsets_path(column), np.asarray(self._offsets[column], dtype=np.int64))
+
+        ids = np.asarray(self._ids, dtype=np.int64)
+        rows = np.argsort(ids, kind="stable")
+        np.save(os.path.join(self.path, "ids.npy"), ids)
+        np.save(os.path.join(self.path, "sorted_ids.npy"), ids[rows])
+        np.save(os.path.join(self.path, "rows.npy"), rows)
+
+        self._files = None
+        self._offsets = None
+        self._ids = None
+
+    def open(self):
+        if self._blobs is not None:
+            return self
+
+        self._offsets = {column: np.load(self._offsets_path(column), mmap_mode="r") for column in self.COLUMNS}
+        self._blobs = {column: self._map(self._column_path(column)) for column in self.COLUMNS}
+        self._sorted_ids = np.load(os.path.join(self.path, "sorted_ids.npy"), mmap_mode="r")
+        self._rows = np.load(os.path.join(self.path, "rows.npy"), mmap_mode="r")
+
+        return self
+
+    def close(self):
+        self.flush()
+
+        if self._blobs is not None:
+            for blob in self._blobs.values():
+                if blob is not None:
+                    blob.close()
+
+        self._blobs = None
+        self._offsets = None
+        self._sorted_ids = None
+        self._rows = None
+
+    def exists(self):
+        return os.path.exists(os.path.join(self.path, "rows.npy"))
+
+    def __len__(self):
+        return len(self.open()._rows)
+
+    def get(self, recipe_ids):
+        """Returns the recipes for the given IDs, in order, with None for unknown IDs."""
+        self.open()
+
+        keys = np.asarray([int(recipe_id) for recipe_id in recipe_ids], dtype=np.int64)
+        positions = np.searchsorted(self._sorted_ids, keys)
+        recipes = []
+
+        for key, position in zip(keys, positions):
+            if position >= len(self._sorted_ids) or self._sorted_ids[position] != key:
+                recipes.append(None)
+                continue
+
+            recipes.append(self._recipe(int(self._rows[position]), key))
+
+        return recipes
+
+    def scan(self, start=0, batch_size=1000):
+        """Yields (next_row, recipes) over the recipes in the order they were loaded, from row start."""
+        self.open()
+        ids = np.load(os.path.join(self.path, "ids.npy"), mmap_mode="r")
+
+        for begin in range(start, len(ids), batch_size):
+            end = min(begin + batch_size, len(ids))
+            yield end, [self._recipe(row, ids[row]) for row in range(begin, end)]
+
+    def documents(self, recipe_ids):
+        """Returns the recipes for the given IDs formatted the way they are shown to the LLM."""
+        return [self.format(recipe) if recipe else None for recipe in self.get(recipe_ids)]
+
+    @staticmethod
+    def format(recipe):
+        return f"Title: {recipe['title']}\nIngredients: {recipe['ingredients']}\n\nSteps: {recipe['steps']}"
+
+    def _recipe(self, row, recipe_id):
+        recipe = {"id": str(recipe_id)}
+        for column in self.COLUMNS:
+            recipe[column] = self._read(column, row)
+        return recipe
+
+    def _read(self, column, row):
+        start = int(self._offsets[column][row])
+        end = int(self._offsets[column][row + 1])
+
+        if start == end:
+            return ""
+
+        return self._blobs[column][start:end].decode("utf-8")
+
+    def _map(self, file_path):
+        # mmap refuses empty files, which happens when a column only has empty strings
+        if os.path.getsize(file_path) == 0:
+            return None
+
+        with open(file_path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _column_path(self, column):
+        return os.path.join(self.path, f"{column}.bin")
+
+    def _offsets_path(self, column):
+        return os.path.join(self.path, f"{column}.offsets.npy")
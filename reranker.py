@@ -0,0 +1,135 @@
+import logging
+import re
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MEAT = ["beef", "chicken", "pork", "lamb", "veal", "bacon", "ham", "sausage", "turkey", "duck", "steak", "mince",
+        "prosciutto", "salami", "pepperoni", "chorizo", "gelatin"]
+SEAFOOD = ["fish", "salmon", "tuna", "cod", "shrimp", "prawn", "crab", "lobster", "anchovy", "clam",
+           "mussel", "oyster", "scallop"]
+DAIRY = ["milk", "butter", "cheese", "cream", "yogurt", "yoghurt", "buttermilk", "ghee", "parmesan", "mozzarella"]
+GLUTEN = ["flour", "wheat", "bread", "breadcrumbs", "pasta", "spaghetti", "noodles", "barley", "rye", "couscous"]
+NUTS = ["almond", "walnut", "pecan", "cashew", "hazelnut", "pistachio", "peanut", "nut"]
+
+# Ingredients that a recipe can't have to respect a diet mentioned in the preferences
+DIET_EXCLUSIONS = {
+        "vegan": MEAT + SEAFOOD + DAIRY + ["egg", "honey"],
+        "vegetarian": MEAT + SEAFOOD,
+        "pescatarian": MEAT,
+        "dairy free": DAIRY,
+        "lactose free": DAIRY,
+        "gluten free": GLUTEN,
+        "nut free": NUTS,
+        }
+
+# Compound ingredients that have a word a diet excludes without being what the diet excludes, e.g.
+# coconut milk is fine for a vegan. Only their first word is kept when checking the diet, so almond
+# milk still breaks a nut free diet.
+DIET_EXCEPTIONS = [
+        (re.compile(r"\b(coconut|almond|soy|soya|oat|rice|cashew|hemp|vegan|non dairy|dairy free|plant based)\s+(milk|cream|butter|cheese|yogh?urt)s?\b"), r"\1"),
+        (re.compile(r"\b(peanut|almond|cashew|hazelnut|sunflower|seed|nut|cocoa|apple)\s+butter\b"), r"\1"),
+        (re.compile(r"\bcream\s+of\s+tartar\b"), "tartar"),
+        (re.compile(r"\b(rice|almond|coconut|chickpea|corn|potato|tapioca|buckwheat|gluten free)\s+(flour|bread|pasta|noodles|spaghetti)\b"), r"\1"),
+        ]
+
+
+def ingredient_pattern(ingredient):
+    """Matches the ingredient in singular or plural, e.g. "eggs" also matches "egg"."""
+    words = ingredient.lower().split()
+    last = words[-1]
+
+    if last.endswith("ies"):
+        ending = re.escape(last[:-3]) + "(y|ies)"
+    elif last.endswith(("oes", "ches", "shes")):
+        ending = re.escape(last[:-2]) + "(es)?"
+    elif last.endswith("s") and not last.endswith("ss"):
+        ending = re.escape(last[:-1]) + "(e?s)?"
+    else:
+        ending = re.escape(last) + "(e?s)?"
+
+    return re.compile(r"\b" + r"\s+".join([re.escape(word) for word in words[:-1]] + [ending]) + r"\b")
+
+
+def diets(diet):
+    """Returns the DIET_EXCLUSIONS keywords in the diet, matched as whole words and skipping negations like "non-vegetarian"."""
+    diet = re.sub(r"[\s_-]+", " ", (diet or "").lower())
+    return [keyword for keyword in DIET_EXCLUSIONS
+            if any(not negation for negation in re.findall(rf"(?:\b(non|not|no) )?\b{keyword}s?\b", diet))]
+
+
+class Reranker:
+    """Chooses the final recipes from the search candidates without calling the LLM.
+
+    Candidates that break a hard constraint (excluded ingredients or the diet) are dropped,
+    the rest are scored by their search score, or by the similarity between their embedding
+    and the query when there's no score, and the final recipes are picked with maximal
+    marginal relevance so that near-duplicates don't take several of the slots.
+    """
+
+    def __init__(self, db, diversity: float = 0.3, include_weight: float = 0.1):
+        self.db = db
+        self.diversity = diversity
+        self.include_weight = include_weight
+
+    def rerank(self, preferences: dict, query: str, ids: list[str], n_results: int = 3, scores: dict = None) -> list[str]:
+        recipes = {recipe["id"]: recipe for recipe in self.db.store.get(ids) if recipe}
+        allowed = [recipe_id for recipe_id in ids if recipe_id in recipes and self.respects_constraints(preferences, recipes[recipe_id])]
+
+        logger.info(f"{len(ids) - len(allowed)} of {len(ids)} candidates filtered out by the constraints")
+
+        if len(allowed) <= n_results:
+            return allowed
+
+        found = self.db.backend.get(allowed, embeddings=True)
+        allowed, embeddings = found["ids"], self.normalize(found["embeddings"])
+
+        if scores:
+            # Scores from the search, so the query isn't embedded again
+            relevance = np.asarray([scores.get(recipe_id, 0.0) for recipe_id in allowed], dtype=np.float32)
+            relevance /= max(float(relevance.max()), 1e-12)
+        else:
+            query_embedding = self.normalize(np.asarray(self.db.embedding_function([query]), dtype=np.float32))[0]
+            relevance = embeddings @ query_embedding
+
+        includes = [ingredient_pattern(ingredient) for ingredient in preferences.get("includeIngredients") or []]
+        if includes:
+            relevance += self.include_weight * np.asarray([
+                sum(1 for pattern in includes if pattern.search(recipes[recipe_id]["ingredients"].lower())) / len(includes)
+                for recipe_id in allowed
+                ], dtype=np.float32)
+
+        return [allowed[i] for i in self.maximal_marginal_relevance(relevance, embeddings, n_results)]
+
+    def respects_constraints(self, preferences: dict, recipe: dict) -> bool:
+        text = f"{recipe['title']} {recipe['ingredients']}".lower()
+        excluded = [ingredient for ingredient in preferences.get("excludeIngredients") or [] if ingredient.strip()]
+        if any(ingredient_pattern(ingredient).search(text) for ingredient in excluded):
+            return False
+
+        diet_excluded = [ingredient for keyword in diets(preferences.get("diet")) for ingredient in DIET_EXCLUSIONS[keyword]]
+        if not diet_excluded:
+            return True
+
+        text = re.sub(r"[\s_-]+", " ", text)
+        for pattern, replacement in DIET_EXCEPTIONS:
+            text = pattern.sub(replacement, text)
+
+        return not any(ingredient_pattern(ingredient).search(text) for ingredient in diet_excluded)
+
+    def maximal_marginal_relevance(self, relevance, embeddings, n_results):
+        selected = [int(np.argmax(relevance))]
+        similarity = embeddings @ embeddings.T
+
+        while len(selected) < min(n_results, len(relevance)):
+            redundancy = similarity[:, selected].max(axis=1)
+            scores = (1 - self.diversity) * relevance - self.diversity * redundancy
+            scores[selected] = -np.inf
+            selected.append(int(np.argmax(scores)))
+
+        return selected
+
+    @staticmethod
+    def normalize(vectors):
+        return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
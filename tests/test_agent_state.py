@@ -0,0 +1,39 @@
+from recipe_cache import RecipeCache
+from state import serialized_size
+
+
+def recipe(title):
+    # Shaped like the food server's find_matches output
+    ingredients = [f"{i + 1} cups of ingredient number {i + 1} for the {title.lower()}, chopped" for i in range(10)]
+    instructions = [f"Step {i + 1}: combine the previous ingredients and cook over medium heat for 5 minutes, stirring often." for i in range(8)]
+    short_description = f"A comforting {title.lower()} with a rich sauce, fresh herbs and a crispy topping."
+    full_description = "\n".join([title, short_description, "Calories: 520 kcal", "Time to prepare: 45 minutes", "Ingredients:"]
+                                 + [f"- {ingredient}" for ingredient in ingredients] + ["Instructions:"] + instructions)
+
+    return {
+            "calories": "520 kcal",
+            "timeToPrepare": "45 minutes",
+            "shortDescription": short_description,
+            "recipeTitle": title,
+            "ingredients": ingredients,
+            "instructions": instructions,
+            "fullDescription": full_description,
+            }
+
+
+def describe(option):
+    return "\n".join([option["recipeTitle"], option["shortDescription"], *option["ingredients"], *option["instructions"]])
+
+
+def test_cache_evicts_the_least_recently_used_recipes():
+    cache = RecipeCache(max_size=2)
+    first, second = cache.put(recipe("First")), cache.put(recipe("Second"))
+    cache.get(first)
+    third = cache.put(recipe("Third"))
+
+    assert first in cache and third in cache and second not in cache
+    assert cache.put(recipe("First")) == first
+
+
+def test_serialized_size_counts_utf8_bytes():
+    assert serialized_size({"message": "pão"}) == len('{"message": "pão"}'.encode("utf-8"))
@@ -0,0 +1,91 @@
+import asyncio
+import time
+
+import pytest
+
+from concurrency import ConcurrencyLimiter
+from readiness import Readiness
+
+
+def test_calls_over_the_cap_wait_in_line():
+    limiter = ConcurrencyLimiter("Test Server", max_concurrency=2)
+    peak = {"running": 0}
+
+    async def call():
+        async with limiter:
+            peak["running"] = max(peak["running"], limiter.running)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(*[call() for _ in range(5)])
+
+    asyncio.run(main())
+
+    assert peak["running"] == 2
+    assert limiter.max_waiting == 3
+    assert (limiter.waiting, limiter.running, limiter.completed) == (0, 0, 5)
+
+
+def test_the_slot_is_released_on_errors():
+    limiter = ConcurrencyLimiter("Test Server", max_concurrency=1)
+
+    async def failing():
+        async with limiter:
+            raise ValueError()
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            asyncio.run(failing())
+
+    assert (limiter.running, limiter.completed) == (0, 2)
+
+
+def test_metrics():
+    limiter = ConcurrencyLimiter("Test Server", max_concurrency=3)
+    lines = limiter.metrics().splitlines()
+
+    assert len(lines) == 6
+    assert lines[0].startswith('mcp_queue_depth{server="Test Server",pid="')
+    assert lines[0].endswith("} 0")
+    assert lines[-1].startswith("mcp_max_concurrency{") and lines[-1].endswith("} 3")
+
+
+def test_calls_wait_for_the_warm_up_in_the_queue():
+    readiness = Readiness("Test Server", time.perf_counter())
+    limiter = ConcurrencyLimiter("Test Server", max_concurrency=4)
+    limiter.wait_for(readiness)
+    observed = {}
+
+    async def main():
+        readiness.start({"slow": lambda: time.sleep(0.2)})
+        calls = [asyncio.create_task(call()) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        observed["waiting"], observed["warming_up"] = limiter.waiting, limiter.warming_up
+        observed["metrics"] = limiter.metrics()
+        await asyncio.gather(*calls)
+
+    async def call():
+        async with limiter:
+            assert readiness.ready
+
+    asyncio.run(main())
+
+    assert observed["waiting"] == 3 and observed["warming_up"] == 3
+    assert "mcp_waiting_for_warm_up{" in observed["metrics"]
+    assert limiter.completed == 3 and limiter.warming_up == 0
+
+
+def test_calls_fail_when_the_warm_up_failed():
+    readiness = Readiness("Test Server", time.perf_counter())
+    limiter = ConcurrencyLimiter("Test Server")
+    limiter.wait_for(readiness)
+
+    async def main():
+        readiness.start({"broken": lambda: time.sleep(0.05) or 1 / 0})
+        async with limiter:
+            pass
+
+    with pytest.raises(RuntimeError, match="broken"):
+        asyncio.run(main())
+
+    assert (limiter.waiting, limiter.running, limiter.completed) == (0, 0, 0)
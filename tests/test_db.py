@@ -0,0 +1,152 @@
+import csv
+import hashlib
+import json
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("chromadb")
+
+from db import VectorDatabase
+from estimators import HeuristicEstimator
+from vector_backends import NumpyBackend
+
+
+def embed(texts):
+    # Deterministic unit vectors, so the tests don't need the embedding model
+    vectors = [np.random.default_rng(int(hashlib.md5(text.encode()).hexdigest()[:8], 16)).normal(size=16) for text in texts]
+    return [(vector / np.linalg.norm(vector)).tolist() for vector in vectors]
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["", "title", "ingredients", "directions"])
+        writer.writerows(rows)
+
+
+def recipe_row(recipe_id, title, ingredients, steps):
+    return [recipe_id, title, json.dumps(ingredients), json.dumps(steps)]
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = VectorDatabase(backend="numpy", path=str(tmp_path / "index"), store_path=str(tmp_path / "store"), lexical_path=str(tmp_path / "lexical"))
+    database.embedding_function = embed
+    return database
+
+
+def test_load_data_skips_malformed_rows(tmp_path, database):
+    write_csv(tmp_path / "recipes.csv", [
+        recipe_row("0", "Toast", ["bread", "butter"], ["Toast the bread.", "Spread the butter."]),
+        ["1", "Broken"],
+        ["2", "Bad JSON", "[\"flour\", ", "not json"],
+        ["three", "Bad id", "[]", "[]"],
+        recipe_row("4", "Tea", ["tea", "water"], ["Boil the water."]),
+        ])
+
+    database.load_data(str(tmp_path / "recipes.csv"), batch_size=2)
+
+    assert database.backend.count() == 3
+    assert [recipe["title"] for recipe in database.store.get(["0", "2", "4"])] == ["Toast", "Bad JSON", "Tea"]
+    assert database.backend.get(["0", "2"])["metadatas"] == [
+            {"title": "Toast", "ingredientsCount": 2, "stepsCount": 2},
+            {"title": "Bad JSON", "ingredientsCount": 1, "stepsCount": 1},
+            ]
+
+
+class Interrupted(Exception):
+    pass
+
+
+class CountingEstimator(HeuristicEstimator):
+    def __init__(self, name="heuristic", interrupt_at=None):
+        self.name = name
+        self.interrupt_at = interrupt_at
+        self.estimated = []
+
+    def estimate(self, recipes):
+        if self.interrupt_at is not None and len(self.estimated) + len(recipes) > self.interrupt_at:
+            raise Interrupted()
+        self.estimated += [recipe["id"] for recipe in recipes]
+        return super().estimate(recipes)
+
+
+class PersistingBackend(NumpyBackend):
+    """Persists every update right away, like Chroma does."""
+
+    def update(self, ids, metadatas):
+        super().update(ids, metadatas)
+        self.flush()
+
+
+@pytest.fixture
+def loaded(tmp_path, database):
+    write_csv(tmp_path / "recipes.csv", [recipe_row(str(i), f"Dish {i}", ["flour", "water"], ["Mix.", "Bake for 10 minutes."]) for i in range(50)])
+    database.load_data(str(tmp_path / "recipes.csv"), batch_size=10)
+    database.progress_file = str(tmp_path / "progress.json")
+    return database
+
+
+def enrich(database, estimator, **kwargs):
+    database.enrich(estimator, batch_size=10, checkpoint_every=2, progress_file=database.progress_file, **kwargs)
+
+
+def estimated_by(database):
+    return [metadata.get("estimatedBy") for metadata in database.backend.get([str(i) for i in range(50)])["metadatas"]]
+
+
+def test_enrich_stores_the_estimates(loaded):
+    enrich(loaded, CountingEstimator())
+
+    metadata = loaded.backend.get(["7"])["metadatas"][0]
+    assert metadata["title"] == "Dish 7"
+    assert metadata["timeSpentCooking"] == "short"
+    assert estimated_by(loaded) == ["heuristic"] * 50
+    assert loaded.search(["Dish 7"], where={"complexity": "easy"}, n_results=1, hydrate=False)["ids"] == [["7"]]
+
+
+def test_resume_skips_the_recipes_persisted_after_the_checkpoint(loaded):
+    loaded.backend = PersistingBackend(path=loaded.backend.path)
+
+    with pytest.raises(Interrupted):
+        enrich(loaded, CountingEstimator(interrupt_at=35))
+
+    # Checkpoint after the second batch, while the third one was already persisted
+    with open(loaded.progress_file) as f:
+        assert json.load(f)["row"] == 20
+
+    resumed = CountingEstimator()
+    enrich(loaded, resumed)
+
+    assert resumed.estimated == [str(i) for i in range(30, 50)]
+    assert estimated_by(loaded) == ["heuristic"] * 50
+
+
+def test_resume_estimates_again_the_updates_lost_after_the_checkpoint(loaded):
+    with pytest.raises(Interrupted):
+        enrich(loaded, CountingEstimator(interrupt_at=35))
+
+    resumed = CountingEstimator()
+    enrich(loaded, resumed)
+
+    assert resumed.estimated == [str(i) for i in range(20, 50)]
+    assert estimated_by(loaded) == ["heuristic"] * 50
+
+
+def test_rerunning_skips_the_recipes_estimated_by_the_same_estimator(loaded):
+    enrich(loaded, CountingEstimator())
+    os.remove(loaded.progress_file)
+
+    rerun = CountingEstimator()
+    enrich(loaded, rerun)
+    assert rerun.estimated == []
+
+    other = CountingEstimator(name="other")
+    enrich(loaded, other)
+    assert len(other.estimated) == 50
+
+    restarted = CountingEstimator(name="other")
+    enrich(loaded, restarted, restart=True)
+    assert len(restarted.estimated) == 50
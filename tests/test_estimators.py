@@ -0,0 +1,114 @@
+import json
+
+import pytest
+
+import llm
+from estimators import HeuristicEstimator, LLMEstimator, calories_bucket, complexity_bucket, create_estimator, parse_list, time_bucket
+
+
+def recipe(recipe_id, ingredients, steps, title="Dish"):
+    return {"id": recipe_id, "title": title, "ingredients": json.dumps(ingredients), "steps": json.dumps(steps)}
+
+
+@pytest.mark.parametrize("minutes, bucket", [(10, "short"), (30, "short"), (31, "moderate"), (75, "moderate"), (76, "long")])
+def test_time_bucket(minutes, bucket):
+    assert time_bucket(minutes) == bucket
+
+
+@pytest.mark.parametrize("steps, ingredients, bucket", [(4, 8, "easy"), (6, 8, "medium"), (10, 12, "medium"), (12, 12, "hard")])
+def test_complexity_bucket(steps, ingredients, bucket):
+    assert complexity_bucket(steps, ingredients) == bucket
+
+
+@pytest.mark.parametrize("calories, bucket", [(200, "low"), (349, "low"), (350, "medium"), (649, "medium"), (650, "high")])
+def test_calories_bucket(calories, bucket):
+    assert calories_bucket(calories) == bucket
+
+
+def test_parse_list():
+    assert parse_list('["a", "b"]') == ["a", "b"]
+    assert parse_list('"a"') == ['"a"']
+    assert parse_list("not json") == ["not json"]
+    assert parse_list("") == []
+
+
+def test_heuristic_reads_the_durations_in_the_steps():
+    quick = HeuristicEstimator().estimate_one(recipe("1", ["bread", "butter"], ["Toast the bread.", "Spread the butter."]))
+    slow = HeuristicEstimator().estimate_one(recipe("2", ["beef", "onion"], ["Brown the beef.", "Simmer for 2 hours."]))
+
+    assert quick["minutesToPrepare"] == 5 + 3 * 2 + 2
+    assert quick["timeSpentCooking"] == "short"
+    assert slow["minutesToPrepare"] == 5 + 3 * 2 + 2 + 120
+    assert slow["timeSpentCooking"] == "long"
+    assert quick["estimatedBy"] == "heuristic"
+
+
+def test_heuristic_calories_follow_the_ingredients():
+    light = HeuristicEstimator().estimate_one(recipe("1", ["lettuce", "cucumber", "tomato", "lemon"], ["Toss."]))
+    rich = HeuristicEstimator().estimate_one(recipe("2", ["butter", "sugar", "cream", "chocolate", "cheese", "bacon"], ["Melt.", "Whisk."]))
+
+    assert light["caloriesPreference"] == "low"
+    assert rich["caloriesPreference"] == "high"
+    assert rich["caloriesPerServing"] > light["caloriesPerServing"]
+
+
+class FakeLLM:
+    answers = []
+
+    def __init__(self, temperature=0.0):
+        pass
+
+    def model(self):
+        return self
+
+    def invoke(self, prompt):
+        answer = FakeLLM.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return type("Response", (), {"text": answer})()
+
+
+@pytest.fixture
+def llm_estimator(monkeypatch):
+    monkeypatch.setattr(llm, "LLM", FakeLLM)
+    return LLMEstimator(batch_size=2)
+
+
+def test_llm_estimates_in_batches(llm_estimator):
+    FakeLLM.answers = [
+        "```json\n" + json.dumps([
+            {"id": "1", "caloriesPerServing": 200, "minutesToPrepare": 20, "complexity": "easy"},
+            {"id": "2", "caloriesPerServing": 800, "minutesToPrepare": 90, "complexity": "hard"},
+            ]) + "\n```",
+        json.dumps([{"id": "3", "caloriesPerServing": 400, "minutesToPrepare": 45, "complexity": "medium"}]),
+        ]
+    recipes = [recipe(recipe_id, ["flour"], ["Bake."]) for recipe_id in ["1", "2", "3"]]
+
+    estimates = llm_estimator.estimate(recipes)
+
+    assert [estimate["complexity"] for estimate in estimates] == ["easy", "hard", "medium"]
+    assert estimates[1] == {"minutesToPrepare": 90, "caloriesPerServing": 800, "timeSpentCooking": "long",
+                            "caloriesPreference": "high", "complexity": "hard", "estimatedBy": "llm"}
+    assert FakeLLM.answers == []
+
+
+def test_llm_falls_back_to_the_heuristic(llm_estimator):
+    FakeLLM.answers = [
+        json.dumps([
+            {"id": "1", "caloriesPerServing": 200, "minutesToPrepare": 20, "complexity": "trivial"},
+            {"id": "2", "caloriesPerServing": None, "minutesToPrepare": 20, "complexity": "easy"},
+            ]),
+        "Sorry, I can't help with that.",
+        RuntimeError("quota exceeded"),
+        ]
+    recipes = [recipe(recipe_id, ["flour"], ["Bake."]) for recipe_id in ["1", "2", "3", "4", "5"]]
+
+    estimates = llm_estimator.estimate(recipes)
+
+    assert [estimate["estimatedBy"] for estimate in estimates] == ["heuristic"] * 5
+
+
+def test_create_estimator():
+    assert isinstance(create_estimator("heuristic"), HeuristicEstimator)
+    with pytest.raises(ValueError):
+        create_estimator("magic")
@@ -0,0 +1,178 @@
+import json
+
+import pytest
+
+pytest.importorskip("langgraph")
+pytest.importorskip("fastmcp")
+
+import graph as graph_module
+from graph import Graph
+from recipe_cache import RecipeCache
+from state import serialized_size
+from test_agent_state import describe, recipe
+
+
+class FakeAgentClient:
+    def __init__(self, recipes):
+        self.recipes = recipes
+        self.translations = []
+        self.images = []
+
+    def run_find_matches(self, preferences):
+        return self.recipes
+
+    def run_translate(self, message, from_language, to_language, formatting="keep formatting"):
+        self.translations.append(message)
+        return f"[{to_language}] {message}"
+
+    def run_create_image(self, recipe, from_language):
+        self.images.append(recipe)
+
+
+class FakeLLM:
+    answer = {}
+
+    def __init__(self, temperature=0.0):
+        pass
+
+    def model(self):
+        return self
+
+    def invoke(self, prompt):
+        FakeLLM.prompt = prompt
+        return type("Response", (), {"text": json.dumps(FakeLLM.answer)})()
+
+
+OPTIONS = [recipe(title) for title in ["Chicken Curry", "Tofu Curry", "Banana Bread"]]
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    monkeypatch.setattr(graph_module, "LLM", FakeLLM)
+    return Graph(agent_client=FakeAgentClient(OPTIONS), cache=RecipeCache(max_size=10))
+
+
+@pytest.fixture
+def recommended(graph):
+    state = {"language": "Portuguese", "message": "Quero curry", "preferences": {"references": "curry"}}
+    return state | graph.recommend_recipes(state)
+
+
+@pytest.mark.parametrize("choice, expected", [
+    ("Tofu Curry", "Tofu Curry"),
+    ("tofu curry!", "Tofu Curry"),
+    ("the Tofu Curry please", "Tofu Curry"),
+    ("Tofu", "Tofu Curry"),
+    ("Chiken Curry", "Chicken Curry"),
+    ("curry", None),
+    ("a", None),
+    ("", None),
+    ("Spaghetti Bolognese", None),
+    ])
+def test_match_title(choice, expected):
+    assert Graph.match_title(choice, [option["recipeTitle"] for option in OPTIONS]) == expected
+
+
+def test_recommend_recipes_only_returns_handles(graph, recommended):
+    assert set(recommended) == {"language", "message", "preferences", "recipeOptions"}
+    assert [graph.cache.get(handle) for handle in recommended["recipeOptions"]] == OPTIONS
+
+
+def test_translate_recipe_options_only_returns_the_response(graph, recommended):
+    update = graph.translate_recipe_options(recommended)
+
+    assert list(update) == ["response"]
+    assert update["response"].startswith("[Portuguese]")
+    assert "- Tofu Curry: " in graph.client.translations[-1]
+
+
+def test_decide_action(graph, recommended):
+    assert graph.decide_action({}) == "identify_language"
+    assert graph.decide_action({"language": "N/A"}) == "identify_language"
+    assert graph.decide_action(recommended) == "update_or_select_recipe"
+    assert graph.decide_action({"language": "English"}) == "translate_to_english"
+
+
+def test_decide_action_when_the_options_were_evicted(recommended):
+    small_cache = RecipeCache(max_size=1)
+    graph = Graph(agent_client=FakeAgentClient(OPTIONS), cache=small_cache)
+    state = recommended | graph.recommend_recipes(recommended)
+
+    assert len(small_cache) == 1
+    assert graph.decide_action(state) == "translate_to_english"
+
+
+def test_selection_sees_the_descriptions_and_resolves_paraphrases(graph, recommended):
+    FakeLLM.answer = {"action": "select_recipe", "recipeSelected": "tofu curry."}
+    command = graph.update_or_select_recipe(recommended)
+
+    assert OPTIONS[1]["shortDescription"] in FakeLLM.prompt
+    assert command.goto == "select_recipe"
+    assert command.update == {"recipeSelected": recommended["recipeOptions"][1]}
+
+
+@pytest.mark.parametrize("choice", ["curry", "a", "Spaghetti Bolognese"])
+def test_ambiguous_or_unknown_selection_updates_the_preferences(graph, recommended, choice):
+    FakeLLM.answer = {"action": "select_recipe", "recipeSelected": choice}
+    command = graph.update_or_select_recipe(recommended)
+
+    assert command.goto == "update_preferences"
+    assert not command.update
+
+
+def test_other_actions(graph, recommended):
+    FakeLLM.answer = {"action": "unable_to_help"}
+
+    assert graph.update_or_select_recipe(recommended).goto == "unable_to_help"
+
+
+def test_selected_recipe_nodes_rebuild_the_description_from_the_cache(graph, recommended):
+    state = recommended | {"recipeSelected": recommended["recipeOptions"][2]}
+
+    assert graph.select_recipe(state) == {}
+    assert graph.generate_image(state) == {"imageGenerated": True}
+    assert "Recipe Title: Banana Bread" in graph.client.images[-1]
+
+    update = graph.responds_with_recipe(state)
+    assert list(update) == ["response"]
+    assert "Recipe Title: Banana Bread" in update["response"]
+
+
+def test_session_state_is_an_order_of_magnitude_smaller(graph):
+    # Runs the nodes of a recommendation and a selection the way the compiled graph merges their updates
+    state = {"language": "Portuguese", "message": "Quero frango", "enMessage": "I want chicken",
+             "preferences": {"references": "chicken", "timeSpentCooking": "short", "doesNotNeedRecipe": False}}
+    state |= graph.recommend_recipes(state)
+    state |= graph.translate_recipe_options(state)
+    listing = state["response"]
+
+    FakeLLM.answer = {"action": "select_recipe", "recipeSelected": "Banana Bread"}
+    state |= {"message": "Quero o pão de banana"}
+    state |= graph.update_or_select_recipe(state).update
+    state |= graph.select_recipe(state)
+    state |= graph.generate_image(state)
+    state |= graph.responds_with_recipe(state)
+    state.pop("response")
+
+    # The same conversation when every node copied the options, their translated listing, the
+    # selected description and its translation into the state
+    full_state = {key: value for key, value in state.items() if key not in ("recipeOptions", "recipeSelected")} | {
+            "enRecipeOptions": OPTIONS,
+            "translatedRecipeOptions": listing,
+            "recipeSelected": OPTIONS[2]["recipeTitle"],
+            "selectedRecipeDescription": describe(OPTIONS[2]),
+            "response": describe(OPTIONS[2]),
+            }
+
+    assert "selectedRecipeDescription" not in state
+    assert serialized_size(full_state) >= 10 * serialized_size(state)
+
+
+def test_no_recipe_options(monkeypatch):
+    monkeypatch.setattr(graph_module, "LLM", FakeLLM)
+    graph = Graph(agent_client=FakeAgentClient([]), cache=RecipeCache())
+    state = {"language": "English", "message": "vegan cheeseburger", "preferences": {"references": "cheeseburger"}}
+    state |= graph.recommend_recipes(state)
+
+    assert "couldn't find recipes" in graph.translate_recipe_options(state)["response"]
+    assert graph.decide_action(state) == "translate_to_english"
@@ -0,0 +1,87 @@
+import pytest
+
+from lexical_index import LexicalIndex, normalize_title, reciprocal_rank_fusion, tokenize
+
+
+RECIPES = [
+        ("1", "Chocolate Chip Cookies", '["2 c. flour", "1 c. chocolate chips", "1 c. butter", "1 c. sugar", "2 eggs", "1 tsp. vanilla"]'),
+        ("2", "Banana Bread", '["3 bananas", "2 c. flour", "1 c. sugar", "1/2 c. butter"]'),
+        ("3", "Chocolate Chip Cookies", '["flour", "chocolate chips"]'),
+        ("4", "Chicken Curry", '["1 lb. chicken", "2 Tbsp. curry powder", "1 can coconut milk"]'),
+        ("5", "Mom's Chocolate Cake", '["flour", "cocoa", "sugar", "chocolate"]'),
+        ("6", "Chocolate Chip Cookies", '["flour", "chocolate chips", "butter", "brown sugar"]'),
+        ("7", "Bobotie", '["1 lb. ground beef", "1 onion", "2 slices bread", "1 c. milk", "2 eggs"]'),
+        ]
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = LexicalIndex(path=str(tmp_path / "lexical"))
+    with index.writer() as writer:
+        for recipe in RECIPES:
+            writer.append(*recipe)
+    return index
+
+
+def test_tokenize_drops_stopwords_units_and_numbers():
+    assert tokenize("2 c. Flour and 1 Tbsp. Mom's curry") == ["flour", "moms", "curry"]
+
+
+def test_normalize_title():
+    assert normalize_title("  Mom's  Chocolate-Cake!") == "moms chocolate cake"
+
+
+def test_search_ranks_title_matches_first(index):
+    ids, scores = index.search("chicken", n_results=5)
+
+    assert ids == ["4"]
+    assert scores[0] > 0
+
+
+def test_search_weights_titles_over_ingredients(index):
+    ids, scores = index.search("bread", n_results=10)
+
+    assert ids == ["2", "7"]
+    assert scores[0] > scores[1]
+
+
+def test_search_without_known_terms(index):
+    assert index.search("boboti") == ([], [])
+    assert index.search("the") == ([], [])
+
+
+def test_exact_title_ignores_case_and_punctuation(index):
+    assert index.exact_title("bobotie") == ["7"]
+    assert index.exact_title("MOMS chocolate cake!") == ["5"]
+
+
+def test_exact_title_ranks_and_caps_shared_titles(index):
+    ranked = index.exact_title("Chocolate Chip Cookies", n_results=10)
+
+    # All three share the title, so the shortest recipe scores highest
+    assert ranked == ["3", "6", "1"]
+    assert index.exact_title("Chocolate Chip Cookies", n_results=2) == ["3", "6"]
+
+
+def test_exact_title_without_matches(index):
+    assert index.exact_title("Chocolate Chip") == []
+    assert index.exact_title("!!") == []
+
+
+def test_spilled_postings_give_the_same_results(tmp_path, index):
+    spilled = LexicalIndex(path=str(tmp_path / "spilled"))
+    spilled.SPILL_SIZE = 3
+    with spilled.writer() as writer:
+        for recipe in RECIPES:
+            writer.append(*recipe)
+
+    for query in ["chocolate chips", "flour sugar butter", "milk"]:
+        assert spilled.search(query) == index.search(query)
+    assert spilled.exact_title("Chocolate Chip Cookies") == index.exact_title("Chocolate Chip Cookies")
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"], []], k=60)
+
+    assert [recipe_id for recipe_id, _ in fused] == ["b", "a", "d", "c"]
+    assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61)
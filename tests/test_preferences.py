@@ -0,0 +1,42 @@
+from preferences import candidate_scores, preference_filters, search_queries, with_estimates
+
+
+def test_search_queries_without_other_wishes():
+    assert search_queries({"references": "lasagna", "diet": " ", "excludeIngredients": []}) == ["lasagna"]
+
+
+def test_search_queries_leave_the_excluded_ingredients_out():
+    preferences = {
+            "references": "pasta",
+            "diet": "vegetarian",
+            "cuisine": "Italian",
+            "includeIngredients": ["tomato", "basil"],
+            "excludeIngredients": ["cheese"],
+            }
+
+    assert search_queries(preferences) == ["pasta", "vegetarian Italian using tomato, basil"]
+
+
+def test_candidate_scores_keep_the_best_score_in_order_of_appearance():
+    results = {"ids": [["1", "2"], ["3", "1"]], "scores": [[0.5, 0.4], [0.9, 0.8]]}
+
+    assert candidate_scores(results) == {"1": 0.8, "2": 0.4, "3": 0.9}
+    assert list(candidate_scores(results)) == ["1", "2", "3"]
+
+
+def test_preference_filters():
+    assert preference_filters({"references": "soup"}) is None
+    assert preference_filters({"timeSpentCooking": "long", "complexity": "N/A", "caloriesPreference": "high"}) is None
+    assert preference_filters({"timeSpentCooking": "short"}) == {"timeSpentCooking": {"$in": ["short"]}}
+    assert preference_filters({"complexity": "medium", "caloriesPreference": "low"}) == {"$and": [
+        {"complexity": {"$in": ["easy", "medium"]}},
+        {"caloriesPreference": {"$in": ["low"]}},
+        ]}
+
+
+def test_with_estimates():
+    document = "Title: Toast"
+
+    assert with_estimates(document, {"title": "Toast"}) == document
+    assert with_estimates(document, {"caloriesPerServing": 250, "minutesToPrepare": 5}) == (
+            "Title: Toast\nCalories per serving: 250 kcal\nTime to prepare: 5 minutes")
@@ -0,0 +1,104 @@
+import logging
+import time
+
+import pytest
+
+import readiness
+from readiness import Readiness
+
+
+def test_steps_are_timed_and_reported():
+    server = Readiness("Test Server", time.perf_counter())
+    server.start({"first": lambda: time.sleep(0.05), "second": lambda: None})
+
+    assert server.wait(timeout=5)
+    report = server.report()
+    assert report["status"] == "ready"
+    assert list(report["steps"]) == ["first", "second"]
+    assert report["steps"]["first"] >= 0.05
+    assert report["startupSeconds"] >= report["steps"]["first"]
+    assert report["error"] is None
+
+
+def test_a_failed_step_stops_the_warm_up():
+    called = []
+    server = Readiness("Test Server", time.perf_counter())
+    server.start({"broken": lambda: 1 / 0, "never": lambda: called.append(True)})
+
+    assert not server.wait(timeout=5)
+    assert server.status == "failed"
+    assert server.error.startswith("broken: ")
+    assert called == []
+
+
+def test_budget_warnings(monkeypatch, caplog):
+    monkeypatch.setattr(readiness, "IMPORT_TIME_BUDGET", 0.0)
+    monkeypatch.setattr(readiness, "STARTUP_TIME_BUDGET", 0.0)
+
+    with caplog.at_level(logging.WARNING, logger="readiness"):
+        server = Readiness("Slow Server", time.perf_counter() - 1)
+        server.start({"step": lambda: None})
+        server.wait(timeout=5)
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert any("to import, over the 0.0s budget" in message for message in messages)
+    assert any("to be ready, over the 0.0s budget" in message for message in messages)
+
+
+def test_no_warnings_within_budget(caplog):
+    with caplog.at_level(logging.WARNING, logger="readiness"):
+        server = Readiness("Fast Server", time.perf_counter())
+        server.start({"step": lambda: None})
+        server.wait(timeout=5)
+
+    assert caplog.records == []
+
+
+class FakeMCP:
+    def __init__(self):
+        self.routes = {}
+
+    def custom_route(self, path, methods):
+        def register(function):
+            self.routes[path] = function
+            return function
+        return register
+
+
+@pytest.mark.parametrize("step, status_code", [(lambda: None, 200), (lambda: 1 / 0, 503)])
+def test_ready_route(step, status_code):
+    pytest.importorskip("starlette")
+    import asyncio
+
+    mcp = FakeMCP()
+    server = Readiness("Test Server", time.perf_counter())
+    server.add_route(mcp)
+    server.start({"step": step})
+    server.wait(timeout=5)
+
+    assert asyncio.run(mcp.routes["/ready"](None)).status_code == status_code
+
+
+def test_wait_ready_doesnt_hold_a_thread():
+    import asyncio
+    import threading
+
+    server = Readiness("Test Server", time.perf_counter())
+
+    async def main():
+        server.start({"slow": lambda: time.sleep(0.2)})
+        threads = threading.active_count()
+        waiters = [asyncio.create_task(server.wait_ready()) for _ in range(20)]
+        await asyncio.sleep(0.05)
+        assert threading.active_count() == threads
+        await asyncio.gather(*waiters)
+
+    asyncio.run(main())
+    assert server.ready
+
+
+def test_wait_ready_without_a_warm_up():
+    import asyncio
+
+    with pytest.raises(RuntimeError, match="starting"):
+        asyncio.run(Readiness("Test Server", time.perf_counter()).wait_ready())
@@ -0,0 +1,52 @@
+import pytest
+
+from recipe_store import RecipeStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = RecipeStore(path=str(tmp_path / "store"))
+    with store.writer() as writer:
+        writer.append("30", "Crème brûlée", '["cream", "sugar"]', '["Bake."]')
+        writer.append("10", "Toast", '["bread"]', "")
+        writer.append("20", "Pão de queijo", '["cheese", "tapioca flour"]', '["Mix.", "Bake."]')
+    return store
+
+
+def test_get_returns_the_recipes_in_the_requested_order(store):
+    recipes = store.get(["20", "30", "10"])
+
+    assert [recipe["id"] for recipe in recipes] == ["20", "30", "10"]
+    assert recipes[0] == {"id": "20", "title": "Pão de queijo", "ingredients": '["cheese", "tapioca flour"]', "steps": '["Mix.", "Bake."]'}
+    assert recipes[1]["title"] == "Crème brûlée"
+
+
+def test_get_keeps_empty_columns(store):
+    assert store.get(["10"])[0]["steps"] == ""
+
+
+def test_get_returns_none_for_unknown_ids(store):
+    assert store.get(["5", "20", "25", "99"]) == [None, store.get(["20"])[0], None, None]
+
+
+def test_get_without_ids(store):
+    assert store.get([]) == []
+
+
+def test_documents(store):
+    assert store.documents(["10", "99"]) == ["Title: Toast\nIngredients: [\"bread\"]\n\nSteps: ", None]
+
+
+def test_scan_follows_the_load_order(store):
+    batches = list(store.scan(start=1, batch_size=1))
+
+    assert [next_row for next_row, _ in batches] == [2, 3]
+    assert [recipes[0]["id"] for _, recipes in batches] == ["10", "20"]
+    assert len(store) == 3
+
+
+def test_reopening_the_store(store):
+    store.close()
+
+    assert RecipeStore(path=store.path).exists()
+    assert RecipeStore(path=store.path).get(["30"])[0]["ingredients"] == '["cream", "sugar"]'
@@ -0,0 +1,135 @@
+import numpy as np
+import pytest
+
+from reranker import Reranker, diets, ingredient_pattern
+
+
+def recipe(title, ingredients):
+    return {"id": title, "title": title, "ingredients": str(ingredients), "steps": "[]"}
+
+
+@pytest.fixture
+def reranker():
+    return Reranker(db=None)
+
+
+@pytest.mark.parametrize("ingredient, text, matches", [
+    ("eggs", "2 egg yolks", True),
+    ("egg", "3 eggs", True),
+    ("egg", "1 eggplant", False),
+    ("tomatoes", "1 tomato", True),
+    ("berries", "1 c. berry jam", True),
+    ("butter", "1 c. butternut squash", False),
+    ("nut", "1 tsp. nutmeg", False),
+    ("sour cream", "1 c. sour  cream", True),
+    ])
+def test_ingredient_pattern(ingredient, text, matches):
+    assert bool(ingredient_pattern(ingredient).search(text)) == matches
+
+
+@pytest.mark.parametrize("diet, expected", [
+    ("vegan", ["vegan"]),
+    ("Gluten-free and vegetarian", ["vegetarian", "gluten free"]),
+    ("non-vegetarian", []),
+    ("not vegan", []),
+    ("vegetarians", ["vegetarian"]),
+    ("keto", []),
+    (None, []),
+    ])
+def test_diets(diet, expected):
+    assert diets(diet) == expected
+
+
+@pytest.mark.parametrize("diet, ingredients, allowed", [
+    ("non-vegetarian", ["1 lb. chicken"], True),
+    ("vegetarian", ["1 lb. chicken"], False),
+    ("vegan", ["1 can coconut milk", "2 Tbsp. peanut butter", "1/2 tsp. cream of tartar"], True),
+    ("vegan", ["1 c. almond milk", "1 c. soy yogurt"], True),
+    ("vegan", ["1 c. milk"], False),
+    ("vegan", ["1/2 c. butter"], False),
+    ("vegan", ["2 eggs"], False),
+    ("gluten free", ["2 c. rice flour", "1 c. almond flour"], True),
+    ("gluten-free", ["2 c. flour"], False),
+    ("nut free", ["1 c. almond milk"], False),
+    ("nut free", ["2 Tbsp. peanut butter"], False),
+    ("dairy free", ["1 c. coconut cream"], True),
+    ])
+def test_diet_constraints(reranker, diet, ingredients, allowed):
+    assert reranker.respects_constraints({"diet": diet}, recipe("Dish", ingredients)) == allowed
+
+
+def test_excluded_ingredients(reranker):
+    preferences = {"excludeIngredients": ["eggs", " "]}
+
+    assert not reranker.respects_constraints(preferences, recipe("Omelette", ["2 egg whites"]))
+    assert reranker.respects_constraints(preferences, recipe("Ratatouille", ["1 eggplant"]))
+
+
+def test_excluded_ingredients_have_no_diet_exceptions(reranker):
+    assert not reranker.respects_constraints({"excludeIngredients": ["milk"]}, recipe("Curry", ["1 can coconut milk"]))
+
+
+class FakeStore:
+    def __init__(self, recipes):
+        self.recipes = recipes
+
+    def get(self, ids):
+        return [self.recipes.get(recipe_id) for recipe_id in ids]
+
+
+class FakeBackend:
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+    def get(self, ids, embeddings=False):
+        return {"ids": ids, "metadatas": [{} for _ in ids], "embeddings": np.asarray([self.embeddings[i] for i in ids], dtype=np.float32)}
+
+
+class FakeDatabase:
+    def __init__(self, recipes, embeddings):
+        self.store = FakeStore(recipes)
+        self.backend = FakeBackend(embeddings)
+
+    def embedding_function(self, texts):
+        raise AssertionError("the query shouldn't be embedded when there are scores")
+
+
+@pytest.fixture
+def database():
+    recipes = {title: recipe(title, ingredients) for title, ingredients in [
+        ("Tofu Curry", ["tofu", "coconut milk"]),
+        ("Tofu Curry II", ["tofu", "coconut milk", "rice"]),
+        ("Lentil Soup", ["lentils", "carrot"]),
+        ("Chicken Curry", ["chicken", "coconut milk"]),
+        ("Bean Chili", ["beans", "tomato"]),
+        ]}
+    embeddings = {
+        "Tofu Curry": [1.0, 0.0, 0.0],
+        "Tofu Curry II": [0.99, 0.1, 0.0],
+        "Lentil Soup": [0.0, 1.0, 0.0],
+        "Chicken Curry": [0.9, 0.0, 0.1],
+        "Bean Chili": [0.0, 0.0, 1.0],
+        }
+    return FakeDatabase(recipes, embeddings)
+
+
+def test_rerank_filters_and_skips_near_duplicates(database):
+    reranker = Reranker(database, diversity=0.5)
+    scores = {"Tofu Curry": 0.9, "Tofu Curry II": 0.85, "Chicken Curry": 0.8, "Lentil Soup": 0.5, "Bean Chili": 0.4}
+
+    selected = reranker.rerank({"diet": "vegan"}, "curry", list(scores), n_results=3, scores=scores)
+
+    assert selected[0] == "Tofu Curry"
+    assert "Chicken Curry" not in selected
+    assert "Tofu Curry II" not in selected
+    assert set(selected[1:]) == {"Lentil Soup", "Bean Chili"}
+
+
+def test_rerank_keeps_the_order_when_few_candidates_are_left(database):
+    reranker = Reranker(database)
+
+    assert reranker.rerank({"excludeIngredients": ["coconut milk"]}, "stew", ["Bean Chili", "Unknown", "Lentil Soup"], n_results=3) == ["Bean Chili", "Lentil Soup"]
+
+
+def test_rerank_without_candidates(database):
+    assert Reranker(database).rerank({"diet": "vegan"}, "chicken", ["Chicken Curry"], n_results=3) == []
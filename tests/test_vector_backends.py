@@ -0,0 +1,153 @@
+import numpy as np
+import pytest
+
+from vector_backends import NumpyBackend, VectorBackend
+
+
+def embeddings(count, dim=32, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top_k(vectors, query, k):
+    return np.argsort(-(vectors @ query), kind="stable")[:k]
+
+
+@pytest.fixture
+def vectors():
+    return embeddings(500)
+
+
+@pytest.fixture
+def backend(tmp_path, vectors):
+    backend = NumpyBackend(path=str(tmp_path / "index"))
+    metadatas = [{"title": f"Recipe {i}", "stepsCount": i % 7, "course": ["main", "dessert"][i % 2]} for i in range(len(vectors))]
+    backend.add([str(1000 + i) for i in range(len(vectors))], vectors, metadatas)
+    backend.flush()
+    return backend
+
+
+def test_incomplete_backends_cant_be_created():
+    class Incomplete(VectorBackend):
+        def add(self, ids, embeddings, metadatas):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+@pytest.mark.parametrize("dtype", ["int8", "float16"])
+def test_query_matches_an_exact_search(tmp_path, vectors, dtype):
+    backend = NumpyBackend(path=str(tmp_path / dtype), dtype=dtype)
+    backend.CHUNK_SIZE = 64
+    backend.add([str(i) for i in range(len(vectors))], vectors, [{} for _ in vectors])
+    backend.flush()
+
+    queries = embeddings(20, seed=1)
+    results = backend.query(queries, n_results=10)
+
+    recall = np.mean([len({int(i) for i in ids} & set(exact_top_k(vectors, query, 10).tolist())) / 10 for query, ids in zip(queries, results["ids"])])
+    assert recall >= 0.9
+    assert all(distances == sorted(distances) for distances in results["distances"])
+
+
+def test_query_returns_metadata_and_distances(backend, vectors):
+    results = backend.query(vectors[42], n_results=1)
+
+    assert results["ids"] == [["1042"]]
+    assert results["metadatas"] == [[{"title": "Recipe 42", "stepsCount": 0, "course": "main"}]]
+    assert results["distances"][0][0] == pytest.approx(0.0, abs=0.01)
+
+
+def test_query_with_where(backend, vectors):
+    results = backend.query(vectors[:5], n_results=20, where={"$and": [{"stepsCount": {"$lte": 2}}, {"course": "dessert"}]})
+
+    for metadatas in results["metadatas"]:
+        assert len(metadatas) == 20
+        assert all(metadata["stepsCount"] <= 2 and metadata["course"] == "dessert" for metadata in metadatas)
+
+
+def test_where_on_a_key_no_recipe_has_matches_nothing(backend, vectors):
+    assert backend.query(vectors[:1], where={"complexity": {"$in": ["easy"]}})["ids"] == [[]]
+    assert backend.get(["1000"], where={"$and": [{"course": "main"}, {"complexity": "easy"}]})["ids"] == []
+
+
+def test_where_on_a_key_that_isnt_a_column_fails(backend, vectors):
+    backend.MAX_CATEGORIES = 10
+    backend.update(["1000"], [{"title": "Recipe 0", "stepsCount": 0, "course": "main"}])
+    backend.flush()
+
+    with pytest.raises(ValueError):
+        backend.query(vectors[:1], where={"title": "Recipe 0"})
+
+
+def test_get_keeps_the_order_and_skips_unknown_ids(backend, vectors):
+    found = backend.get(["1003", "7", "1001"], embeddings=True)
+
+    assert found["ids"] == ["1003", "1001"]
+    assert [metadata["title"] for metadata in found["metadatas"]] == ["Recipe 3", "Recipe 1"]
+    np.testing.assert_allclose(found["embeddings"], vectors[[3, 1]], atol=0.02)
+
+
+def test_get_without_ids(backend):
+    assert backend.get([], where={"course": "main"}, embeddings=True)["ids"] == []
+
+
+def test_append(backend, vectors):
+    extra = embeddings(10, seed=2)
+    backend.add([str(5000 + i) for i in range(10)], extra, [{"stepsCount": 100} for _ in range(10)])
+    backend.flush()
+
+    assert backend.count() == 510
+    assert backend.query(extra[3], n_results=1)["ids"] == [["5003"]]
+    assert backend.get(["5003"], where={"stepsCount": {"$gt": 50}})["ids"] == ["5003"]
+
+
+def test_update(backend, vectors):
+    backend.update(["1001", "1002"], [{"title": "Recipe 1", "complexity": "easy"}, {"title": "Recipe 2", "complexity": "hard"}])
+    backend.flush()
+
+    assert backend.get(["1001", "1002", "1003"], where={"complexity": "easy"})["ids"] == ["1001"]
+    assert backend.get(["1003"])["metadatas"] == [{"title": "Recipe 3", "stepsCount": 3, "course": "dessert"}]
+    assert backend.query(vectors[2], n_results=1)["ids"] == [["1002"]]
+
+
+def test_update_unknown_ids(backend):
+    with pytest.raises(KeyError):
+        backend.update(["7"], [{}])
+
+
+def test_clusters(tmp_path, vectors):
+    backend = NumpyBackend(path=str(tmp_path / "clusters"), n_clusters=8, n_probe=8)
+    backend.add([str(i) for i in range(len(vectors))], vectors, [{} for _ in vectors])
+    backend.flush()
+
+    # Probing every cluster scans every row
+    query = embeddings(1, seed=3)[0]
+    assert [int(i) for i in backend.query(query, n_results=5)["ids"][0]] == exact_top_k(vectors, query, 5).tolist()
+
+
+def test_reopening_takes_the_dtype_of_the_index(tmp_path, vectors):
+    path = str(tmp_path / "float16")
+    built = NumpyBackend(path=path, dtype="float16")
+    built.add([str(i) for i in range(len(vectors))], vectors, [{} for _ in vectors])
+    built.flush()
+
+    reopened = NumpyBackend(path=path)
+    assert reopened.query(vectors[7], n_results=1)["ids"] == [["7"]]
+
+    reopened.add(["9999"], vectors[:1], [{}])
+    reopened.flush()
+    assert NumpyBackend(path=path).count() == len(vectors) + 1
+
+    with pytest.raises(ValueError, match="float16"):
+        NumpyBackend(path=path, dtype="int8").query(vectors[7])
+
+
+def test_new_indexes_default_to_int8(tmp_path, vectors):
+    backend = NumpyBackend(path=str(tmp_path / "new"))
+    backend.add(["1"], vectors[:1], [{}])
+    backend.flush()
+
+    assert backend.dtype == "int8"
+    assert NumpyBackend(path=backend.path, dtype="int8").count() == 1
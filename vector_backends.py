@@ -0,0 +1,534 @@
+import json
+import mmap
+import os
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+
+class VectorBackend(ABC):
+    """Storage and nearest neighbour search for the recipe embeddings.
+
+    Results follow Chroma's query format: one list of ids, metadatas and distances per
+    query embedding, with distances being squared L2 distances (smaller is closer).
+    """
+
+    @abstractmethod
+    def add(self, ids, embeddings, metadatas):
+        ...
+
+    @abstractmethod
+    def query(self, embeddings, n_results=10, where=None):
+        ...
+
+    @abstractmethod
+    def update(self, ids, metadatas):
+        """Replaces the metadata of the given recipes."""
+
+    @abstractmethod
+    def get(self, ids, where=None, embeddings=False):
+        """Returns the ids and metadatas of the given recipes that match where, keeping their order.
+
+        With embeddings=True the result also has an "embeddings" float32 matrix, one row per id.
+        """
+
+    @abstractmethod
+    def count(self):
+        ...
+
+    def flush(self):
+        pass
+
+
+class ChromaBackend(VectorBackend):
+    def __init__(self, path="./chroma_db", collection_name="recipes"):
+        import chromadb
+
+        self.client = chromadb.PersistentClient(path=path)
+        self.collection = self.client.get_or_create_collection(name=collection_name)
+
+    def add(self, ids, embeddings, metadatas):
+        self.collection.add(ids=ids, embeddings=embeddings, metadatas=metadatas)
+
+    def query(self, embeddings, n_results=10, where=None):
+        return self.collection.query(
+                query_embeddings=embeddings,
+                where=where,
+                n_results=n_results,
+                include=["metadatas", "distances"]
+                )
+
+    def update(self, ids, metadatas):
+        self.collection.update(ids=ids, metadatas=metadatas)
+
+    def get(self, ids, where=None, embeddings=False):
+        if not ids:
+            # Chroma rejects an empty list of ids
+            output = {"ids": [], "metadatas": []}
+            if embeddings:
+                output["embeddings"] = np.empty((0, 0), dtype=np.float32)
+            return output
+
+        results = self.collection.get(ids=ids, where=where, include=["metadatas", "embeddings"] if embeddings else ["metadatas"])
+        positions = {recipe_id: position for position, recipe_id in enumerate(results["ids"])}
+        found = [recipe_id for recipe_id in ids if recipe_id in positions]
+        output = {"ids": found, "metadatas": [results["metadatas"][positions[recipe_id]] for recipe_id in found]}
+
+        if embeddings:
+            vectors = [results["embeddings"][positions[recipe_id]] for recipe_id in found]
+            output["embeddings"] = np.asarray(vectors, dtype=np.float32).reshape(len(found), -1)
+
+        return output
+
+    def count(self):
+        return self.collection.count()
+
+
+class NumpyBackend(VectorBackend):
+    """In-process index over a memory-mapped, quantized embedding matrix.
+
+    Embeddings are stored as int8 with one float32 scale per row, or as float16, and are
+    searched with a chunked matrix product. When n_clusters is set, flush() runs a small
+    k-means over the rows, and once the clusters exist queries only scan the n_probe
+    closest ones.
+
+    Metadata is kept as JSON lines next to the matrix. Numeric keys and string keys with
+    few distinct values are also stored as NumPy columns so that where filters are
+    evaluated without parsing the JSON.
+
+    dtype defaults to the one the index at path was built with, and to int8 for a new index.
+    """
+
+    # Rows scored at once. Each chunk is converted to float32, so this bounds the memory a
+    # query needs on top of the memory-mapped matrix (16384 x 384 x 4 bytes = 24 MB).
+    CHUNK_SIZE = 16384
+    MAX_CATEGORIES = 1024
+
+    def __init__(self, path="./numpy_index", dtype=None, n_clusters=None, n_probe=8):
+        if dtype not in (None, "int8", "float16"):
+            raise ValueError(f"Unsupported dtype: {dtype}")
+
+        self.path = path
+        self.dtype = dtype
+        self.n_clusters = n_clusters
+        self.n_probe = n_probe
+        self._writer = None
+        self._updates = {}
+        self._index = None
+
+    # Writing
+
+    def add(self, ids, embeddings, metadatas):
+        if self._writer is None:
+            self._open_writer()
+
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if self._writer["dim"] is None:
+            self._writer["dim"] = vectors.shape[1]
+
+        if self.dtype == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            quantized = np.round(vectors / scales[:, None]).astype(np.int8)
+            self._writer["scales"].write(scales.astype(np.float32).tobytes())
+        else:
+            quantized = vectors.astype(np.float16)
+
+        self._writer["embeddings"].write(quantized.tobytes())
+        self._writer["ids"].write(np.asarray([int(i) for i in ids], dtype=np.int64).tobytes())
+
+        for metadata in metadatas:
+            line = (json.dumps(metadata) + "\n").encode("utf-8")
+            self._writer["metadata"].write(line)
+            self._writer["offsets"].append(self._writer["offsets"][-1] + len(line))
+
+        self._writer["count"] += len(vectors)
+
+    def update(self, ids, metadatas):
+        rows = self._rows(ids)
+        if len(rows) != len(ids):
+            raise KeyError(f"{len(ids) - len(rows)} of the ids aren't in the index")
+
+        # Applied by flush(), which rewrites the metadata file and the columns
+        self._updates.update(zip(rows.tolist(), metadatas))
+
+    def flush(self):
+        appended = self._writer is not None
+        updated = bool(self._updates)
+
+        if appended:
+            for name in ("embeddings", "scales", "ids", "metadata"):
+                self._writer[name].close()
+
+            np.save(self._file("metadata.offsets.npy"), np.asarray(self._writer["offsets"], dtype=np.int64))
+            with open(self._file("index.json"), "w") as f:
+                json.dump({"dtype": self.dtype, "dim": self._writer["dim"], "count": self._writer["count"]}, f)
+
+            self._writer = None
+            self.close()
+
+        if updated:
+            self._rewrite_metadata()
+
+        if not (appended or updated):
+            return
+
+        self._build_columns()
+
+        if not appended:
+            return
+
+        if self.n_clusters:
+            self._build_clusters()
+        else:
+            # Clusters from a previous build wouldn't include the rows that were just added
+            for name in ("centroids.npy", "cluster_rows.npy", "cluster_offsets.npy"):
+                if os.path.exists(self._file(name)):
+                    os.remove(self._file(name))
+
+    def _rewrite_metadata(self):
+        index = self._open()
+        offsets = [0]
+        temporary_path = self._file("metadata.jsonl.tmp")
+
+        with open(temporary_path, "wb") as f:
+            for row in range(index["count"]):
+                if row in self._updates:
+                    line = (json.dumps(self._updates[row]) + "\n").encode("utf-8")
+                else:
+                    line = index["metadata"][int(index["metadata_offsets"][row]):int(index["metadata_offsets"][row + 1])]
+                f.write(line)
+                offsets.append(offsets[-1] + len(line))
+
+        self.close()
+        os.replace(temporary_path, self._file("metadata.jsonl"))
+        np.save(self._file("metadata.offsets.npy"), np.asarray(offsets, dtype=np.int64))
+        self._updates = {}
+
+    def _open_writer(self):
+        os.makedirs(self.path, exist_ok=True)
+        self.close()
+
+        info = self._info()
+        self._check_dtype(info)
+
+        offsets_path = self._file("metadata.offsets.npy")
+        offsets = np.load(offsets_path).tolist() if info else [0]
+
+        self._writer = {
+                "dim": info["dim"] if info else None,
+                "count": info["count"] if info else 0,
+                "offsets": offsets,
+                "embeddings": open(self._file("embeddings.bin"), "ab"),
+                "scales": open(self._file("scales.bin"), "ab"),
+                "ids": open(self._file("ids.bin"), "ab"),
+                "metadata": open(self._file("metadata.jsonl"), "ab"),
+                }
+
+    def _build_columns(self):
+        index = self._open()
+        values = {}
+
+        for row in range(index["count"]):
+            for key, value in self._metadata(row).items():
+                values.setdefault(key, [None] * index["count"])[row] = value
+
+        columns = {}
+        for key, column in values.items():
+            present = [value for value in column if value is not None]
+
+            if all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in present):
+                data = np.asarray([np.nan if value is None else value for value in column], dtype=np.float64)
+                np.save(self._file(f"column.{key}.npy"), data)
+                columns[key] = {"kind": "numeric"}
+                continue
+
+            categories = sorted({str(value) for value in present})
+            if len(categories) <= self.MAX_CATEGORIES:
+                codes = {category: code for code, category in enumerate(categories)}
+                data = np.asarray([-1 if value is None else codes[str(value)] for value in column], dtype=np.int16)
+                np.save(self._file(f"column.{key}.npy"), data)
+                columns[key] = {"kind": "categorical", "categories": categories}
+            else:
+                columns[key] = {"kind": "unindexed"}
+
+        with open(self._file("columns.json"), "w") as f:
+            json.dump(columns, f)
+
+        self.close()
+
+    def _build_clusters(self, sample_size=100000, iterations=10, seed=0):
+        index = self._open()
+        count = index["count"]
+        n_clusters = min(self.n_clusters, count)
+        rng = np.random.default_rng(seed)
+
+        sample = np.sort(rng.choice(count, size=min(sample_size, count), replace=False))
+        vectors = self._dequantize(sample)
+        centroids = vectors[rng.choice(len(vectors), size=n_clusters, replace=False)]
+
+        for _ in range(iterations):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            for cluster in range(n_clusters):
+                members = vectors[assignments == cluster]
+                if len(members):
+                    centroids[cluster] = members.mean(axis=0)
+            centroids /= np.linalg.norm(centroids, axis=1, keepdims=True) + 1e-12
+
+        assignments = np.empty(count, dtype=np.int32)
+        for start in range(0, count, self.CHUNK_SIZE):
+            rows = np.arange(start, min(start + self.CHUNK_SIZE, count))
+            assignments[rows] = np.argmax(self._dequantize(rows) @ centroids.T, axis=1)
+
+        rows = np.argsort(assignments, kind="stable")
+        offsets = np.searchsorted(assignments[rows], np.arange(n_clusters + 1))
+
+        np.save(self._file("centroids.npy"), centroids.astype(np.float32))
+        np.save(self._file("cluster_rows.npy"), rows.astype(np.int64))
+        np.save(self._file("cluster_offsets.npy"), offsets.astype(np.int64))
+
+        self.close()
+
+    # Reading
+
+    def query(self, embeddings, n_results=10, where=None):
+        index = self._open()
+        queries = np.asarray(embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+
+        allowed = self._filter(where) if where else None
+        results = {"ids": [], "metadatas": [], "distances": []}
+
+        for query in queries:
+            rows = self._candidates(query)
+            if allowed is not None:
+                rows = rows[allowed[rows]] if rows is not None else np.flatnonzero(allowed)
+
+            top_rows, scores = self._top_k(query, rows, n_results)
+
+            # Squared L2 distance, assuming normalized embeddings like Chroma's default model
+            results["ids"].append([str(index["ids"][row]) for row in top_rows])
+            results["metadatas"].append([self._metadata(row) for row in top_rows])
+            results["distances"].append([float(max(2.0 - 2.0 * score, 0.0)) for score in scores])
+
+        return results
+
+    def get(self, ids, where=None, embeddings=False):
+        index = self._open()
+        rows = self._rows(ids)
+
+        if where:
+            rows = rows[self._filter(where)[rows]]
+
+        output = {"ids": [str(index["ids"][row]) for row in rows], "metadatas": [self._metadata(row) for row in rows]}
+        if embeddings:
+            output["embeddings"] = self._dequantize(rows)
+
+        return output
+
+    def count(self):
+        info = self._info()
+        return info["count"] if info else 0
+
+    def close(self):
+        if self._index is not None and self._index["metadata"] is not None:
+            self._index["metadata"].close()
+        self._index = None
+
+    def _rows(self, ids):
+        index = self._open()
+        if index["sorted_ids"] is None:
+            index["id_rows"] = np.argsort(index["ids"], kind="stable")
+            index["sorted_ids"] = index["ids"][index["id_rows"]]
+
+        keys = np.asarray([int(recipe_id) for recipe_id in ids], dtype=np.int64)
+        positions = np.minimum(np.searchsorted(index["sorted_ids"], keys), max(index["count"] - 1, 0))
+        found = index["sorted_ids"][positions] == keys
+
+        return index["id_rows"][positions[found]]
+
+    def _candidates(self, query):
+        if self._index["centroids"] is None:
+            return None
+
+        centroids = self._index["centroids"]
+        n_probe = min(self.n_probe, len(centroids))
+        clusters = np.argpartition(-(centroids @ query), n_probe - 1)[:n_probe]
+        offsets = self._index["cluster_offsets"]
+        rows = self._index["cluster_rows"]
+
+        return np.sort(np.concatenate([rows[offsets[c]:offsets[c + 1]] for c in clusters]))
+
+    def _top_k(self, query, rows, k):
+        count = self._index["count"] if rows is None else len(rows)
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+
+        for start in range(0, count, self.CHUNK_SIZE):
+            end = min(start + self.CHUNK_SIZE, count)
+            chunk = np.arange(start, end) if rows is None else rows[start:end]
+            scores = self._scores(query, chunk, contiguous=rows is None)
+
+            if len(scores) > k:
+                keep = np.argpartition(-scores, k - 1)[:k]
+                chunk, scores = chunk[keep], scores[keep]
+
+            best_rows = np.concatenate([best_rows, chunk])
+            best_scores = np.concatenate([best_scores, scores])
+
+        order = np.argsort(-best_scores, kind="stable")[:k]
+        return best_rows[order], best_scores[order]
+
+    def _scores(self, query, rows, contiguous=False):
+        matrix = self._index["embeddings"]
+        block = matrix[rows[0]:rows[-1] + 1] if contiguous and len(rows) else matrix[rows]
+        scores = block.astype(np.float32) @ query
+
+        if self.dtype == "int8":
+            scales = self._index["scales"]
+            scores *= scales[rows[0]:rows[-1] + 1] if contiguous and len(rows) else scales[rows]
+
+        return scores
+
+    def _dequantize(self, rows):
+        vectors = self._index["embeddings"][rows].astype(np.float32)
+        if self.dtype == "int8":
+            vectors *= self._index["scales"][rows][:, None]
+        return vectors
+
+    def _filter(self, where):
+        count = self._index["count"]
+
+        if "$and" in where:
+            mask = np.ones(count, dtype=bool)
+            for clause in where["$and"]:
+                mask &= self._filter(clause)
+            return mask
+
+        if "$or" in where:
+            mask = np.zeros(count, dtype=bool)
+            for clause in where["$or"]:
+                mask |= self._filter(clause)
+            return mask
+
+        mask = np.ones(count, dtype=bool)
+        for key, condition in where.items():
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for operator, value in condition.items():
+                mask &= self._compare(key, operator, value)
+
+        return mask
+
+    def _compare(self, key, operator, value):
+        spec = self._index["columns"].get(key)
+        if spec is None:
+            # Like Chroma, a key no recipe has matches nothing, e.g. the estimates before enrich_data.py runs
+            return np.zeros(self._index["count"], dtype=bool)
+        if spec["kind"] == "unindexed":
+            raise ValueError(f"Metadata key '{key}' has too many distinct values to be filtered with the numpy backend")
+
+        if key not in self._index["column_data"]:
+            self._index["column_data"][key] = np.load(self._file(f"column.{key}.npy"), mmap_mode="r")
+        column = self._index["column_data"][key]
+
+        if spec["kind"] == "categorical":
+            codes = {category: code for code, category in enumerate(spec["categories"])}
+            if operator in ("$in", "$nin"):
+                mask = np.isin(column, [codes[str(v)] for v in value if str(v) in codes])
+                return mask if operator == "$in" else ~mask
+            code = codes.get(str(value), -2)
+            if operator == "$eq":
+                return column == code
+            if operator == "$ne":
+                return column != code
+            raise ValueError(f"Operator {operator} isn't supported on '{key}'")
+
+        operators = {
+                "$eq": np.equal,
+                "$ne": np.not_equal,
+                "$gt": np.greater,
+                "$gte": np.greater_equal,
+                "$lt": np.less,
+                "$lte": np.less_equal,
+                }
+        if operator in ("$in", "$nin"):
+            mask = np.isin(column, value)
+            return mask if operator == "$in" else ~mask
+        if operator not in operators:
+            raise ValueError(f"Operator {operator} isn't supported on '{key}'")
+
+        return operators[operator](column, value)
+
+    def _metadata(self, row):
+        offsets = self._index["metadata_offsets"]
+        start, end = int(offsets[row]), int(offsets[row + 1])
+        return json.loads(self._index["metadata"][start:end])
+
+    def _open(self):
+        if self._index is not None:
+            return self._index
+
+        info = self._info()
+        if not info:
+            raise FileNotFoundError(f"No numpy index found at {self.path}")
+
+        self._check_dtype(info)
+        count, dim = info["count"], info["dim"]
+        dtype = np.int8 if self.dtype == "int8" else np.float16
+
+        with open(self._file("metadata.jsonl"), "rb") as f:
+            metadata = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if count else None
+
+        columns = {}
+        if os.path.exists(self._file("columns.json")):
+            with open(self._file("columns.json")) as f:
+                columns = json.load(f)
+
+        has_clusters = os.path.exists(self._file("centroids.npy"))
+
+        self._index = {
+                "count": count,
+                "embeddings": np.memmap(self._file("embeddings.bin"), dtype=dtype, mode="r", shape=(count, dim)),
+                "scales": np.memmap(self._file("scales.bin"), dtype=np.float32, mode="r", shape=(count,)) if self.dtype == "int8" else None,
+                "ids": np.memmap(self._file("ids.bin"), dtype=np.int64, mode="r", shape=(count,)),
+                "metadata": metadata,
+                "metadata_offsets": np.load(self._file("metadata.offsets.npy"), mmap_mode="r"),
+                "columns": columns,
+                "column_data": {},
+                "sorted_ids": None,
+                "id_rows": None,
+                "centroids": np.load(self._file("centroids.npy")) if has_clusters else None,
+                "cluster_rows": np.load(self._file("cluster_rows.npy"), mmap_mode="r") if has_clusters else None,
+                "cluster_offsets": np.load(self._file("cluster_offsets.npy")) if has_clusters else None,
+                }
+
+        return self._index
+
+    def _check_dtype(self, info):
+        if info is None:
+            self.dtype = self.dtype or "int8"
+        elif self.dtype is None:
+            self.dtype = info["dtype"]
+        elif info["dtype"] != self.dtype:
+            raise ValueError(f"Index at {self.path} was built with {info['dtype']}, not {self.dtype}")
+
+    def _info(self):
+        if not os.path.exists(self._file("index.json")):
+            return None
+
+        with open(self._file("index.json")) as f:
+            return json.load(f)
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+
+def create_backend(name, **kwargs):
+    if name == "chroma":
+        return ChromaBackend(**kwargs)
+    if name == "numpy":
+        return NumpyBackend(**kwargs)
+
+    raise ValueError(f"Unknown vector backend: {name}")